@@ -0,0 +1,223 @@
+# archive.py
+# Eagle Eye - forecast archive (SQLite)
+# - main.py appends every run: run metadata + per-(area, date) day objects and the inputs behind them
+# - long-term days are kept as (date, rank) only; their shared text once per (run, area)
+# - indexed by area_key / target_date / run timestamp for skill evaluation without git archaeology
+# - best-effort history: in CI the file is carried in its own actions/cache entry (eagle-eye-archive-*)
+#   plus a 90-day "forecast-archive" artifact. GitHub evicts caches unused for 7 days or over the
+#   repository size cap, so copy the file elsewhere if the history has to outlive that.
+#
+# usage:
+#   python archive.py runs
+#   python archive.py history tokyo_shibuya 2026-11-03 --runs 7
+#   python archive.py rank-changes --runs 30 [--area tokyo_shibuya] [--by-date]
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_at       TEXT NOT NULL,            -- ISO timestamp (JST)
+    run_date     TEXT NOT NULL,            -- YYYY-MM-DD
+    kind         TEXT NOT NULL,            -- full / weather
+    model        TEXT,
+    duration_sec REAL,
+    meta_json    TEXT
+);
+CREATE TABLE IF NOT EXISTS area_runs (
+    run_id         INTEGER NOT NULL REFERENCES runs(run_id),
+    area_key       TEXT NOT NULL,
+    long_term_text TEXT,
+    PRIMARY KEY (run_id, area_key)
+);
+CREATE TABLE IF NOT EXISTS days (
+    run_id       INTEGER NOT NULL REFERENCES runs(run_id),
+    area_key     TEXT NOT NULL,
+    target_date  TEXT NOT NULL,            -- YYYY-MM-DD
+    is_long_term INTEGER NOT NULL,
+    rank         TEXT,
+    day_json     TEXT,                     -- NULL: plain long-term day (rebuilt from area_runs.long_term_text)
+    inputs_json  TEXT,                     -- facts block / fingerprint the AI day was generated from
+    PRIMARY KEY (run_id, area_key, target_date)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_run_at ON runs(run_at);
+CREATE INDEX IF NOT EXISTS idx_days_area_date ON days(area_key, target_date);
+CREATE INDEX IF NOT EXISTS idx_days_target_date ON days(target_date);
+"""
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+class Archive:
+    def __init__(self, path: str):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # --- write ---
+    def begin_run(self, run_at: str, run_date: str, kind: str = "full", model: str = None, meta=None) -> int:
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO runs (run_at, run_date, kind, model, meta_json) VALUES (?, ?, ?, ?, ?)",
+                (run_at, run_date, kind, model, _dumps(meta or {})),
+            )
+        return cur.lastrowid
+
+    def add_area(self, run_id: int, area_key: str, compact: dict, inputs=None):
+        """
+        compact: {"long_term_text", "days": [full day objects], "long_term": [[date_key, rank], ...]}
+        (main.compact_area output); inputs: {date_key: {...}} for AI days.
+        """
+        inputs = inputs or {}
+        rows = []
+        for day in compact.get("days") or []:
+            dk = day.get("date_key")
+            if not dk:
+                continue
+            rows.append((run_id, area_key, dk, int(bool(day.get("is_long_term"))), day.get("rank"),
+                         _dumps(day), _dumps(inputs[dk]) if dk in inputs else None))
+        for dk, rank in compact.get("long_term") or []:
+            rows.append((run_id, area_key, dk, 1, rank, None, None))
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO area_runs (run_id, area_key, long_term_text) VALUES (?, ?, ?)",
+                (run_id, area_key, compact.get("long_term_text") or ""),
+            )
+            self.conn.executemany("INSERT OR REPLACE INTO days VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def finish_run(self, run_id: int, duration_sec: float):
+        with self.conn:
+            self.conn.execute("UPDATE runs SET duration_sec = ? WHERE run_id = ?", (duration_sec, run_id))
+
+    # --- queries ---
+    def recent_runs(self, limit: int = 20):
+        cur = self.conn.execute(
+            "SELECT r.run_id, r.run_at, r.kind, r.model, r.duration_sec,"
+            " (SELECT COUNT(*) FROM area_runs a WHERE a.run_id = r.run_id) AS areas"
+            " FROM runs r ORDER BY r.run_at DESC, r.run_id DESC LIMIT ?",
+            (limit,),
+        )
+        return [dict(r) for r in cur]
+
+    def history(self, area_key: str, target_date: str, runs: int = 7):
+        """the forecast for one (area, date) as issued by the last N runs that covered it (newest first)"""
+        cur = self.conn.execute(
+            "SELECT r.run_id, r.run_at, r.kind, d.rank, d.is_long_term, d.day_json, d.inputs_json"
+            " FROM days d JOIN runs r ON r.run_id = d.run_id"
+            " WHERE d.area_key = ? AND d.target_date = ?"
+            " ORDER BY r.run_at DESC, r.run_id DESC LIMIT ?",
+            (area_key, target_date, runs),
+        )
+        out = []
+        for r in cur:
+            row = dict(r)
+            day_json, inputs_json = row.pop("day_json"), row.pop("inputs_json")
+            row["day"] = json.loads(day_json) if day_json else None
+            row["inputs"] = json.loads(inputs_json) if inputs_json else None
+            out.append(row)
+        return out
+
+    def rank_changes(self, runs: int = 30, area_key: str = None, by_date: bool = False):
+        """
+        How often the rank of the same (area, date) changed between consecutive full runs,
+        over the last N full runs. Grouped per area (or per area and date).
+        """
+        group = "area_key, target_date" if by_date else "area_key"
+        where = "AND d.area_key = ?" if area_key else ""
+        params = [runs] + ([area_key] if area_key else [])
+        cur = self.conn.execute(
+            f"""
+            WITH recent AS (
+                SELECT run_id FROM runs WHERE kind = 'full' ORDER BY run_at DESC, run_id DESC LIMIT ?
+            ),
+            seq AS (
+                SELECT d.area_key, d.target_date, d.rank,
+                       LAG(d.rank) OVER (PARTITION BY d.area_key, d.target_date ORDER BY r.run_at, r.run_id) AS prev
+                FROM days d JOIN runs r ON r.run_id = d.run_id
+                WHERE d.run_id IN (SELECT run_id FROM recent) {where}
+            )
+            SELECT {group},
+                   SUM(prev IS NOT NULL) AS comparisons,
+                   SUM(prev IS NOT NULL AND prev != rank) AS changes
+            FROM seq GROUP BY {group} ORDER BY {group}
+            """,
+            params,
+        )
+        out = []
+        for r in cur:
+            row = dict(r)
+            row["change_rate"] = round(row["changes"] / row["comparisons"], 3) if row["comparisons"] else 0.0
+            out.append(row)
+        return out
+
+# =========================
+# CLI
+# =========================
+def _print_rows(rows, cols):
+    print("  ".join(cols))
+    for r in rows:
+        print("  ".join("-" if r.get(c) is None else str(r.get(c)) for c in cols))
+
+def main(argv=None):
+    default_path = os.environ.get("ARCHIVE_PATH") or os.path.join(
+        os.environ.get("CACHE_DIR", os.path.join(os.path.dirname(__file__), ".cache")), "archive.sqlite3")
+    ap = argparse.ArgumentParser(description="Eagle Eye forecast archive")
+    ap.add_argument("--db", default=default_path, help="SQLite file")
+    ap.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("runs", help="recent runs")
+    p.add_argument("--limit", type=int, default=20)
+
+    p = sub.add_parser("history", help="one (area, date) across the last N runs")
+    p.add_argument("area_key")
+    p.add_argument("target_date", help="YYYY-MM-DD")
+    p.add_argument("--runs", type=int, default=7)
+
+    p = sub.add_parser("rank-changes", help="how often rank changed between consecutive full runs")
+    p.add_argument("--runs", type=int, default=30)
+    p.add_argument("--area", default=None)
+    p.add_argument("--by-date", action="store_true")
+
+    args = ap.parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f"archive not found: {args.db}", file=sys.stderr)
+        return 1
+
+    store = Archive(args.db)
+    try:
+        if args.cmd == "runs":
+            rows = store.recent_runs(args.limit)
+            cols = ["run_id", "run_at", "kind", "areas", "duration_sec", "model"]
+        elif args.cmd == "history":
+            rows = store.history(args.area_key, args.target_date, args.runs)
+            for r in rows:
+                r["summary"] = ((r.get("day") or {}).get("weather_overview") or {}).get("condition")
+            cols = ["run_id", "run_at", "kind", "rank", "is_long_term", "summary"]
+        else:
+            rows = store.rank_changes(args.runs, args.area, args.by_date)
+            cols = ["area_key"] + (["target_date"] if args.by_date else []) + ["comparisons", "changes", "change_rate"]
+    finally:
+        store.close()
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        _print_rows(rows, cols)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
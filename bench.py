@@ -0,0 +1,390 @@
+# bench.py
+# Eagle Eye - offline benchmark for main.py
+# - Local stub server stands in for JMA / AMeDAS / Open-Meteo / Gemini
+# - Recorded responses (--fixtures) or synthetic ones, with latency & error injection
+# - Runs main() across scaled area counts and RUN_DAYS/AI_DAYS, reports throughput/latency
+#
+# usage:
+#   python bench.py
+#   python bench.py --areas 31,100 --ai-days 3,7 --gemini-latency-ms 800 --error-rate 0.05
+#   python bench.py --fixtures recorded/ --out bench_report.json
+
+import argparse
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import main as ee
+
+# =========================
+# Stub server
+# =========================
+class StubConfig:
+    def __init__(self, latency_ms: dict, error_rate: float, fixtures_dir: str = None, seed: int = 0):
+        self.latency_ms = latency_ms  # family -> ms
+        self.error_rate = error_rate
+        self.fixtures_dir = fixtures_dir
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.prefixes = set()  # systemInstruction texts seen (implicit context cache)
+
+    def hit(self, family: str) -> bool:
+        """count request, sleep injected latency; True -> inject an error response"""
+        with self.lock:
+            self.counts[family] = self.counts.get(family, 0) + 1
+            fail = self.rng.random() < self.error_rate
+        ms = self.latency_ms.get(family, 0)
+        if ms:
+            time.sleep(ms / 1000.0)
+        return fail
+
+def _seed_of(text: str) -> int:
+    return sum(ord(c) for c in text)
+
+def _today():
+    return datetime.now(ee.JST).replace(hour=0, minute=0, second=0, microsecond=0)
+
+def synth_jma_forecast(code: str):
+    base = _today()
+    s = _seed_of(code)
+    iso = lambda dt: dt.strftime("%Y-%m-%dT%H:%M:%S+09:00")
+    days3 = [base + timedelta(days=i) for i in range(3)]
+    six_h = [base + timedelta(hours=6 * i) for i in range(8)]
+    week = [base + timedelta(days=i) for i in range(7)]
+    return [
+        {"timeSeries": [
+            {"timeDefines": [iso(d) for d in days3],
+             "areas": [{"weatherCodes": [str(100 + (s + i) % 3 * 100) for i in range(3)]}]},
+            {"timeDefines": [iso(d) for d in six_h],
+             "areas": [{"pops": [str((s + i * 10) % 100) for i in range(8)]}]},
+            {"timeDefines": [iso(base + timedelta(hours=9)), iso(base + timedelta(hours=15))],
+             "areas": [{"temps": [str(5 + s % 10), str(12 + s % 10)]}]},
+        ]},
+        {"timeSeries": [
+            {"timeDefines": [iso(d) for d in week],
+             "areas": [{"weatherCodes": ["201"] * 7, "pops": ["", "30", "40", "20", "10", "50", "60"]}]},
+            {"timeDefines": [iso(d) for d in week],
+             "areas": [{"tempsMin": [""] + [str(3 + (s + i) % 5) for i in range(6)],
+                        "tempsMax": [""] + [str(12 + (s + i) % 6) for i in range(6)]}]},
+        ]},
+    ]
+
+def synth_amedas(code: str):
+    s = _seed_of(code)
+    base = _today()
+    return {(base + timedelta(hours=h)).strftime("%Y%m%d%H%M%S"): {"temp": [float(2 + (s + h) % 12), 0]}
+            for h in range(0, 10)}
+
+def synth_openmeteo_one(lat: float, lon: float, days: int):
+    base = _today()
+    s = int(abs(lat * 100 + lon * 100))
+    n = 24 * days
+    times = [(base + timedelta(hours=h)).strftime("%Y-%m-%dT%H:%M") for h in range(n)]
+    return {
+        "latitude": lat, "longitude": lon,
+        "hourly": {
+            "time": times,
+            "temperature_2m": [round(5 + (s + h) % 15 + 0.3, 1) for h in range(n)],
+            "relative_humidity_2m": [40 + (s + h) % 50 for h in range(n)],
+            "precipitation_probability": [(s + 7 * h) % 100 for h in range(n)],
+            "weathercode": [[0, 1, 2, 3, 61, 80][(s + h) % 6] for h in range(n)],
+        },
+    }
+
+def synth_ai_day(date_key: str = None):
+    day = {
+        "rank": "B",
+        "event_traffic_facts": ["ベンチマーク用の交通情報"],
+        "peak_windows": {k: "17-21" for k in ee.JOB_KEYS},
+        "job_actions": {k: "ベンチマーク用の打ち手" for k in ee.JOB_KEYS},
+        "daily_schedule_and_impact": "■Event & Traffic\nベンチマーク\n\n■総括\nベンチマーク\n\n■職業別の打ち手（要点）\n・タクシー: -",
+        "timeline": {slot: {"advice": {k: "ベンチマーク" for k in ee.JOB_KEYS}} for slot in ee.SLOT_NAMES},
+        "confidence": 60,
+    }
+    if date_key:
+        day["date_key"] = date_key
+    return day
+
+def synth_gemini_text(payload: dict) -> str:
+    prompt = "".join(p.get("text", "") for c in payload.get("contents", []) for p in c.get("parts", []))
+    cfg = payload.get("generationConfig", {})
+
+    if cfg.get("responseMimeType") != "application/json":
+        # grounded search -> free text by date
+        dates = sorted(set(re.findall(r"\d{4}-\d{2}-\d{2}", prompt)))
+        if not dates:
+            return "向こう3ヶ月は平年並みの気温傾向。週末はイベントによる人出増が見込まれます。"
+        if "@@ YYYY-MM-DD" not in prompt:
+            return "\n".join(f"### {d}\n- {d} 主要路線は平常運転（ベンチマーク）\n- 周辺でイベント開催予定（未確認）" for d in dates)
+        # delimiter format; regional searches tag each bullet with a sub-area key
+        keys = re.findall(r"^- (\w+): ", prompt, re.M)
+        out = []
+        for d in dates:
+            out.append(f"@@ {d}")
+            out.append("- [common] 主要路線は平常運転（ベンチマーク）" if keys else "- 主要路線は平常運転（ベンチマーク）")
+            out.extend(f"- [{k}] 周辺でイベント開催予定（未確認）" for k in keys[:3])
+        return "\n".join(out)
+
+    batch_keys = re.findall(r"=== Day \d+ \((\d{4}-\d{2}-\d{2})\) ===", prompt)
+    if batch_keys:
+        return json.dumps({"days": [synth_ai_day(d) for d in batch_keys]}, ensure_ascii=False)
+
+    region_days = re.findall(r'"(\d{4}-\d{2}-\d{2})": \{([^}]*)\}', prompt)
+    if region_days:
+        # regional conversion: {date: {"common": ..., area_key: ...}}
+        return json.dumps({
+            d: {k: f"- {d} {k} 主要路線は平常運転（ベンチマーク）" for k in re.findall(r'"(\w+)": "\.\.\."', inner)}
+            for d, inner in region_days
+        }, ensure_ascii=False)
+
+    convert_keys = re.findall(r'"(\d{4}-\d{2}-\d{2})": "\.\.\."', prompt)
+    if convert_keys:
+        return json.dumps({d: f"- {d} 主要路線は平常運転（ベンチマーク）" for d in convert_keys}, ensure_ascii=False)
+
+    return json.dumps(synth_ai_day(), ensure_ascii=False)
+
+class StubHandler(BaseHTTPRequestHandler):
+    cfg: StubConfig = None
+    protocol_version = "HTTP/1.1"  # keep-alive like the real upstreams
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body, content_type="application/json", etag: bool = False):
+        raw = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        tag = '"%s"' % hashlib.sha1(raw).hexdigest()[:16] if etag and status == 200 else None
+        if tag and self.headers.get("If-None-Match") == tag:
+            # like JMA's CDN: unchanged JSON -> 304 without a body
+            self.send_response(304)
+            self.send_header("ETag", tag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        gzipped = status == 200 and len(raw) >= 1024 and "gzip" in (self.headers.get("Accept-Encoding") or "")
+        if gzipped:
+            raw = gzip.compress(raw, compresslevel=5)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(raw)))
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        if tag:
+            self.send_header("ETag", tag)
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _fixture(self, path: str):
+        if not self.cfg.fixtures_dir:
+            return None
+        fp = os.path.join(self.cfg.fixtures_dir, path.lstrip("/").replace(":", "_"))
+        if os.path.isfile(fp):
+            with open(fp, "rb") as f:
+                return f.read()
+        return None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path
+        family = "openmeteo" if path.startswith("/v1/forecast") else ("amedas" if "/amedas/" in path else "jma")
+        if self.cfg.hit(family):
+            return self._send(503, {"error": "injected"})
+
+        recorded = self._fixture(path)
+        if recorded is not None:
+            return self._send(200, recorded)
+
+        m = re.match(r"^/bosai/forecast/data/forecast/(\w+)\.json$", path)
+        if m:
+            return self._send(200, synth_jma_forecast(m.group(1)), etag=True)
+        m = re.match(r"^/bosai/warning/data/warning/(\w+)\.json$", path)
+        if m:
+            return self._send(200, {"warnings": [{"status": "発表なし"}]}, etag=True)
+        m = re.match(r"^/bosai/amedas/data/point/(\w+)/\d+_1h\.json$", path)
+        if m:
+            return self._send(200, synth_amedas(m.group(1)))
+        if path == "/v1/forecast":
+            q = parse_qs(url.query)
+            lats = [float(x) for x in q["latitude"][0].split(",")]
+            lons = [float(x) for x in q["longitude"][0].split(",")]
+            days = int(q.get("forecast_days", ["7"])[0])
+            results = [synth_openmeteo_one(a, b, days) for a, b in zip(lats, lons)]
+            return self._send(200, results if len(results) > 1 else results[0])
+        return self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.cfg.hit("gemini"):
+            return self._send(503, {"error": {"code": 503, "message": "injected"}})
+
+        text = synth_gemini_text(payload)
+        prompt_chars = len(json.dumps(payload, ensure_ascii=False))
+        system = "".join(p.get("text", "") for p in (payload.get("systemInstruction") or {}).get("parts", []))
+        with self.cfg.lock:
+            cached = len(system) // 3 if system in self.cfg.prefixes else 0
+            if system:
+                self.cfg.prefixes.add(system)
+        return self._send(200, {
+            "candidates": [{"content": {"parts": [{"text": text}]}}],
+            "usageMetadata": {"promptTokenCount": prompt_chars // 3, "candidatesTokenCount": len(text) // 3,
+                              "cachedContentTokenCount": cached},
+        })
+
+def start_stub(cfg: StubConfig):
+    handler = type("BoundStubHandler", (StubHandler,), {"cfg": cfg})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# =========================
+# Scenario runner
+# =========================
+def scaled_areas(n: int) -> dict:
+    """n areas cycling the real TARGET_AREAS (coords jittered so each is a distinct location)"""
+    base = list(ee.TARGET_AREAS.items())
+    out = {}
+    for i in range(n):
+        key, data = base[i % len(base)]
+        rep = i // len(base)
+        area = dict(data)
+        if rep:
+            key = f"{key}_{rep}"
+            area["name"] = f"{data['name']} #{rep}"
+            area["lat"] = round(data["lat"] + 0.001 * rep, 4)
+            area["lon"] = round(data["lon"] + 0.001 * rep, 4)
+        out[key] = area
+    return out
+
+def run_scenario(base_url: str, cfg: StubConfig, n_areas: int, run_days: int, ai_days: int, args):
+    work = tempfile.mkdtemp(prefix="eagle_bench_")
+    try:
+        ee.JMA_BASE_URL = ee.OPENMETEO_BASE_URL = ee.GEMINI_BASE_URL = base_url
+        ee.API_KEY = "bench"
+        ee.TARGET_AREAS = scaled_areas(n_areas)
+        ee.RUN_DAYS = run_days
+        ee.AI_DAYS = ai_days
+        ee.AI_BATCH_DAYS = args.batch_days
+        ee.OUTPUT_PATH = os.path.join(work, "assets", "eagle_eye_data.json")
+        ee.STATE_PATH = os.path.join(work, "assets", "eagle_eye_state.json")
+        # every output the flags (OUTPUT_FORMAT / OUTPUT_SHARDS / OUTPUT_DELTAS) can enable stays in work
+        ee.COMPACT_OUTPUT_PATH = os.path.join(work, "assets", "eagle_eye_data.v2.json")
+        ee.SHARD_DIR = os.path.join(work, "assets", "areas")
+        ee.DELTA_DIR = os.path.join(work, "assets", "deltas")
+        ee.RUN_REPORT_PATH = os.path.join(work, "run_report.json")
+        ee.CACHE_DIR = os.path.join(work, ".cache")
+        ee.GEMINI_CACHE_DIR = os.path.join(ee.CACHE_DIR, "gemini")
+        ee.HTTP_CACHE_DIR = os.path.join(ee.CACHE_DIR, "http")
+        ee.ARCHIVE_PATH = os.path.join(ee.CACHE_DIR, "archive.sqlite3")
+        ee.SHARD_RESULTS_DIR = os.path.join(ee.CACHE_DIR, "shards")
+        ee.GEMINI_CACHE = False  # measure the pipeline, not the response cache
+        ee.INCREMENTAL = False
+        if args.no_rate_limit:
+            for g in ee.UPSTREAMS.values():
+                g.rate = 0
+        ee._http_session = None
+
+        with cfg.lock:
+            cfg.counts = {}
+        sink = io.StringIO()
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else sink):
+            ee.main([])
+        wall = time.perf_counter() - t0
+
+        with open(ee.RUN_REPORT_PATH, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        out_bytes = os.path.getsize(ee.OUTPUT_PATH) if os.path.exists(ee.OUTPUT_PATH) else 0
+        with cfg.lock:
+            counts = dict(cfg.counts)
+        return {
+            "areas": n_areas,
+            "run_days": run_days,
+            "ai_days": ai_days,
+            "wall_sec": round(wall, 2),
+            "areas_per_sec": round(n_areas / wall, 2) if wall > 0 else 0.0,
+            "requests": counts,
+            "output_bytes": out_bytes,
+            "stages": {name: {k: st[k] for k in ("count", "p50_ms", "p90_ms", "p99_ms", "max_ms")}
+                       for name, st in report.get("stages", {}).items()},
+            "area_total_ms": report.get("area_total_ms", {}),
+            "tokens_in": report.get("totals", {}).get("tokens_in", 0),
+            "tokens_cached": report.get("totals", {}).get("tokens_cached", 0),
+            "bytes_in": report.get("totals", {}).get("bytes_in", 0),
+        }
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+def _int_list(text: str):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+def main():
+    ap = argparse.ArgumentParser(description="Eagle Eye offline benchmark (stub upstreams)")
+    ap.add_argument("--areas", default="31,100,500", help="comma-separated area counts")
+    ap.add_argument("--run-days", default="90", help="comma-separated RUN_DAYS values")
+    ap.add_argument("--ai-days", default="7", help="comma-separated AI_DAYS values")
+    ap.add_argument("--batch-days", type=int, default=ee.AI_BATCH_DAYS)
+    ap.add_argument("--jma-latency-ms", type=int, default=30)
+    ap.add_argument("--openmeteo-latency-ms", type=int, default=80)
+    ap.add_argument("--gemini-latency-ms", type=int, default=300)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub responses that are 503")
+    ap.add_argument("--fixtures", default=None, help="dir of recorded responses mirroring request paths")
+    ap.add_argument("--no-rate-limit", action="store_true", help="disable the per-upstream token buckets")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="write results as JSON")
+    ap.add_argument("--verbose", action="store_true", help="show main.py output")
+    args = ap.parse_args()
+
+    cfg = StubConfig(
+        latency_ms={"jma": args.jma_latency_ms, "amedas": args.jma_latency_ms,
+                    "openmeteo": args.openmeteo_latency_ms, "gemini": args.gemini_latency_ms},
+        error_rate=args.error_rate,
+        fixtures_dir=args.fixtures,
+        seed=args.seed,
+    )
+    server = start_stub(cfg)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"🧪 stub upstreams: {base_url}", flush=True)
+
+    results = []
+    try:
+        for n in _int_list(args.areas):
+            for run_days in _int_list(args.run_days):
+                for ai_days in _int_list(args.ai_days):
+                    r = run_scenario(base_url, cfg, n, run_days, ai_days, args)
+                    results.append(r)
+                    ai = r["stages"].get("ai_days_batch") or r["stages"].get("ai_day") or {}
+                    print(
+                        f"areas={n:4d} run_days={run_days:3d} ai_days={ai_days:2d} | "
+                        f"wall={r['wall_sec']:7.2f}s  {r['areas_per_sec']:6.2f} areas/s | "
+                        f"area p50={r['area_total_ms'].get('p50', 0):8.0f}ms p90={r['area_total_ms'].get('p90', 0):8.0f}ms | "
+                        f"ai p50={ai.get('p50_ms', 0):6.0f}ms | req={sum(r['requests'].values())} "
+                        f"out={r['output_bytes'] / 1024:.0f}KB",
+                        flush=True,
+                    )
+    finally:
+        server.shutdown()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"✅ {args.out}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ import 'package:flutter/services.dart' show rootBundle;
 
 /// ===============================
 /// Eagle Eye - main.dart
-/// - assets/eagle_eye_data.json を読み込み
+/// - assets/eagle_eye_data.json を読み込み（従来形式 / compact schema v2 の両対応）
 /// - 職業選択で「ピーク」「打ち手」「時間帯アドバイス」を切替
 /// ===============================
 
@@ -286,6 +286,11 @@ class EagleEyeRepo {
       throw Exception('eagle_eye_data.json の形式が不正です（rootがMapではない）');
     }
 
+    // compact schema v2（長期予測は [日付, ランク] のみ → ここで展開）
+    if (decoded['schema_version'] == 2) {
+      return _expandCompact(Map<String, dynamic>.from(decoded));
+    }
+
     final out = <String, List<ForecastDay>>{};
     decoded.forEach((areaKey, value) {
       if (value is List) {
@@ -297,6 +302,71 @@ class EagleEyeRepo {
     });
     return out;
   }
+
+  static const _weekdaysJa = ['月', '火', '水', '木', '金', '土', '日'];
+
+  Map<String, List<ForecastDay>> _expandCompact(Map<String, dynamic> doc) {
+    final jobKeys = (doc['job_keys'] is List)
+        ? (doc['job_keys'] as List).map((e) => e.toString()).toList()
+        : const ['taxi', 'delivery', 'restaurant', 'retail', 'hotel'];
+    final areas = (doc['areas'] is Map) ? doc['areas'] as Map : const {};
+
+    final out = <String, List<ForecastDay>>{};
+    areas.forEach((areaKey, value) {
+      if (value is! Map) return;
+      final longTermText = (value['long_term_text'] ?? '').toString();
+      final entries = <MapEntry<String, ForecastDay>>[];
+
+      final days = value['days'];
+      if (days is List) {
+        for (final m in days.whereType<Map>()) {
+          final j = Map<String, dynamic>.from(m);
+          entries.add(MapEntry((j['date_key'] ?? '').toString(), ForecastDay.fromJson(j)));
+        }
+      }
+
+      final longTerm = value['long_term'];
+      if (longTerm is List) {
+        for (final rec in longTerm.whereType<List>()) {
+          if (rec.length < 2) continue;
+          final dateKey = rec[0].toString();
+          final dt = DateTime.tryParse(dateKey);
+          if (dt == null) continue;
+          entries.add(MapEntry(dateKey, _longTermDay(dt, rec[1].toString(), longTermText, jobKeys)));
+        }
+      }
+
+      entries.sort((a, b) => a.key.compareTo(b.key));
+      out[areaKey.toString()] = entries.map((e) => e.value).toList();
+    });
+    return out;
+  }
+
+  // main.py build_long_term_day と同じ形
+  ForecastDay _longTermDay(DateTime dt, String rank, String longTermText, List<String> jobKeys) {
+    final mmdd = '${dt.month.toString().padLeft(2, '0')}月${dt.day.toString().padLeft(2, '0')}日';
+    return ForecastDay(
+      date: '$mmdd (${_weekdaysJa[dt.weekday - 1]})',
+      isLongTerm: true,
+      rank: rank,
+      weatherOverview: WeatherOverview(
+        condition: '☁️',
+        high: '-',
+        low: '-',
+        rain: '-',
+        rainAm: null,
+        rainPm: null,
+        rainNight: null,
+        warning: '-',
+      ),
+      eventTrafficFacts: const [],
+      peakWindows: {for (final k in jobKeys) k: ''},
+      jobActions: {for (final k in jobKeys) k: ''},
+      dailyScheduleAndImpact: '【$mmddの長期予測】\n\n■長期傾向\n$longTermText\n',
+      timeline: null,
+      confidence: 0,
+    );
+  }
 }
 
 /// ===============================
@@ -5,15 +5,28 @@
 # - Robust: still generates output even if Gemini/Open-Meteo/JMA fails
 
 import os
+import argparse
+import asyncio
+import contextvars
+import copy
+import email.utils
+import functools
 import json
+import hashlib
+import math
 import time
 import re
-import urllib.request
+import shutil
+import threading
+from array import array
 from datetime import datetime, timedelta, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 import requests
 
+import archive
+
 # =========================
 # Settings
 # =========================
@@ -22,12 +35,85 @@ GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
 
 JST = timezone(timedelta(hours=9), "JST")
 
+# Upstream base URLs (overridable for the offline benchmark / stub server)
+JMA_BASE_URL = os.environ.get("JMA_BASE_URL", "https://www.jma.go.jp")
+OPENMETEO_BASE_URL = os.environ.get("OPENMETEO_BASE_URL", "https://api.open-meteo.com")
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+
 RUN_DAYS = int(os.environ.get("RUN_DAYS", "90"))  # total days to output
 AI_DAYS = int(os.environ.get("AI_DAYS", "7"))     # first N days try AI output
 
-MAX_WORKERS = int(os.environ.get("MAX_WORKERS", "4"))  # keep modest for CI
-
-OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "assets", "eagle_eye_data.json")
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", "16"))  # I/O threads shared by all upstream calls
+# max in-flight calls per upstream (keeps any single API from being hammered)
+UPSTREAM_CONCURRENCY = {
+    "jma": int(os.environ.get("JMA_CONCURRENCY", "6")),            # forecast / warning / AMeDAS
+    "openmeteo": int(os.environ.get("OPENMETEO_CONCURRENCY", "2")),
+    "gemini": int(os.environ.get("GEMINI_CONCURRENCY", "8")),
+}
+# per-upstream token bucket (requests/sec, burst) shared by all workers
+UPSTREAM_RATE = {
+    "jma": (float(os.environ.get("JMA_RPS", "10")), 10),
+    "openmeteo": (float(os.environ.get("OPENMETEO_RPS", "5")), 5),
+    "gemini": (float(os.environ.get("GEMINI_RPS", "2")), 4),
+}
+# circuit breaker: after N consecutive failures the upstream is skipped (fallback path) for a cooldown
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_SEC = float(os.environ.get("BREAKER_COOLDOWN_SEC", "120"))
+RETRY_AFTER_MAX_SEC = float(os.environ.get("RETRY_AFTER_MAX_SEC", "60"))  # cap for honoured Retry-After
+OPENMETEO_BATCH_SIZE = int(os.environ.get("OPENMETEO_BATCH_SIZE", "50"))  # locations per bulk request
+AI_BATCH_DAYS = int(os.environ.get("AI_BATCH_DAYS", "7"))  # days per Gemini call (<=1: one call per day)
+# AI scheduling: (area, day-chunk) units run nearest day first across all areas, then by AREA_WEIGHTS
+PRIORITY_NEAR_DAYS = int(os.environ.get("PRIORITY_NEAR_DAYS", "2"))  # first chunk per area (0: no split)
+DEADLINE_SECONDS = float(os.environ.get("DEADLINE_SECONDS", "0"))    # >0: no new AI unit after this (fallback)
+
+BASE_DIR = os.path.dirname(__file__)
+OUTPUT_PATH = os.path.join(BASE_DIR, "assets", "eagle_eye_data.json")
+CACHE_DIR = os.environ.get("CACHE_DIR", os.path.join(BASE_DIR, ".cache"))  # local only (gitignored)
+
+# HTTP: every upstream call goes through one pooled session (keep-alive, gzip)
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = {"jma": 15.0, "openmeteo": 30.0, "gemini": 75.0}  # seconds, per upstream
+HTTP_CACHE = os.environ.get("HTTP_CACHE", "1") != "0"  # ETag / Last-Modified revalidation for JMA JSON
+HTTP_CACHE_DIR = os.path.join(CACHE_DIR, "http")
+
+# Output format: full = one object per day (current app); compact = schema v2 (shared long-term text,
+# long-term days as [date, rank]); both = full at OUTPUT_PATH + compact at COMPACT_OUTPUT_PATH
+OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", "full")
+COMPACT_OUTPUT_PATH = os.path.join(BASE_DIR, "assets", "eagle_eye_data.v2.json")
+COMPACT_SCHEMA_VERSION = 2
+# Sharded output: one minified file per area + index.json manifest (hash/size/generated_at per shard)
+OUTPUT_SHARDS = os.environ.get("OUTPUT_SHARDS", "0") == "1"
+SHARD_DIR = os.path.join(BASE_DIR, "assets", "areas")
+# Run-to-run deltas: per-(area, date) changes vs the previous output + index.json (apply with apply_delta);
+# the diff base is the previous run's per-area shards: without OUTPUT_SHARDS=1 no delta is written (warned)
+OUTPUT_DELTAS = os.environ.get("OUTPUT_DELTAS", "0") == "1"
+DELTA_DIR = os.path.join(BASE_DIR, "assets", "deltas")
+DELTA_KEEP = int(os.environ.get("DELTA_KEEP", "14"))  # newest N delta files are kept
+DELTA_SCHEMA_VERSION = 1
+
+# Forecast archive (SQLite): every run's day objects + inputs, queryable with `python archive.py`
+# (best-effort: local file; CI carries it in a separate cache entry + artifact, see archive.py)
+ARCHIVE = os.environ.get("ARCHIVE", "1") != "0"
+ARCHIVE_PATH = os.environ.get("ARCHIVE_PATH", os.path.join(CACHE_DIR, "archive.sqlite3"))
+
+# Horizontal shards: `--shard i/N` writes one result file here, `--merge` combines them (CI job matrix)
+SHARD_RESULTS_DIR = os.environ.get("SHARD_RESULTS_DIR", os.path.join(CACHE_DIR, "shards"))
+
+RUN_REPORT_PATH = os.environ.get("RUN_REPORT_PATH", os.path.join(BASE_DIR, "run_report.json"))
+
+# Incremental regeneration: reuse last AI output when a day's input facts are unchanged
+INCREMENTAL = os.environ.get("INCREMENTAL", "1") != "0"
+STATE_PATH = os.path.join(BASE_DIR, "assets", "eagle_eye_state.json")  # committed with the output
+
+# Gemini response cache (on disk, content-addressed)
+GEMINI_CACHE = os.environ.get("GEMINI_CACHE", "1") != "0"  # 0: bypass (always hit the API)
+GEMINI_CACHE_DIR = os.path.join(CACHE_DIR, "gemini")
+GEMINI_CACHE_MAX_MB = float(os.environ.get("GEMINI_CACHE_MAX_MB", "64"))  # LRU eviction above this
+GEMINI_CACHE_TTL_HOURS = {
+    "event_search": float(os.environ.get("GEMINI_CACHE_TTL_EVENT_H", "6")),       # news moves fast
+    "long_term": float(os.environ.get("GEMINI_CACHE_TTL_LONG_TERM_H", "72")),     # 3-month outlook
+    "json": float(os.environ.get("GEMINI_CACHE_TTL_JSON_H", "24")),               # reformat / day reports
+}
 
 # Jobs fixed to 5 (MVP)
 JOB_KEYS = ["taxi", "delivery", "restaurant", "retail", "hotel"]
@@ -75,6 +161,21 @@ TARGET_AREAS = {
     "okinawa_naha": { "name": "沖縄 那覇", "jma_code": "471000", "amedas_code": "91197", "lat": 26.2124, "lon": 127.6809, "feature": "国際通り。観光客メイン。台風等の天候影響大。" },
 }
 
+# higher = generated earlier among units of the same day offset (default 1)
+AREA_WEIGHTS = {
+    "tokyo_shinjuku": 3, "osaka_kita": 3,
+    "tokyo_marunouchi": 2, "tokyo_ginza": 2, "tokyo_shibuya": 2, "tokyo_roppongi": 2,
+    "osaka_minami": 2, "aichi_nagoya": 2, "fukuoka": 2, "sapporo": 2, "kanagawa_yokohama": 2,
+}
+
+# Event/traffic search by region: areas whose jma_code maps to the same metro share one search
+# (other jma_codes form their own region). Groups larger than EVENT_REGION_MAX_AREAS are split; <=1 = per area.
+EVENT_REGION_OF_JMA = {
+    "130000": "kanto", "120000": "kanto", "140000": "kanto",     # 東京 / 千葉 / 神奈川
+    "270000": "kansai", "260000": "kansai", "280000": "kansai",  # 大阪 / 京都 / 兵庫
+}
+EVENT_REGION_MAX_AREAS = int(os.environ.get("EVENT_REGION_MAX_AREAS", "20"))
+
 # =========================
 # Utilities
 # =========================
@@ -145,18 +246,417 @@ def get_weather_emoji_openmeteo(code):
         pass
     return "☁️"
 
+# =========================
+# Run metrics (stage timings / counters -> run_report.json)
+# =========================
+METRIC_FIELDS = ["bytes_in", "bytes_out", "retries", "cache_hits", "fallbacks", "tokens_in", "tokens_out", "tokens_cached", "prompt_chars"]
+
+_metric_area = contextvars.ContextVar("metric_area", default=None)
+_metric_rec = contextvars.ContextVar("metric_rec", default=None)
+
+def _percentile(sorted_vals, p):
+    # nearest-rank
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(p / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+def _summarize(records):
+    ms = sorted(r["ms"] for r in records)
+    out = {
+        "count": len(ms),
+        "total_ms": round(sum(ms), 1),
+        "p50_ms": round(_percentile(ms, 50), 1),
+        "p90_ms": round(_percentile(ms, 90), 1),
+        "p99_ms": round(_percentile(ms, 99), 1),
+        "max_ms": round(ms[-1], 1) if ms else 0.0,
+    }
+    for f in METRIC_FIELDS:
+        out[f] = sum(r.get(f, 0) for r in records)
+    return out
+
+class RunMetrics:
+    """
+    One record per stage execution: {stage, area, ms, bytes_in, ..., tokens_out}.
+    Low-level code adds counters to the active record with metric_add().
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.records = []
+            self.area_counters = {}  # counters outside any stage (e.g. day fallbacks)
+            self.started = time.time()
+
+    @contextmanager
+    def stage(self, name: str):
+        rec = {"stage": name, "area": _metric_area.get(), "ms": 0.0}
+        for f in METRIC_FIELDS:
+            rec[f] = 0
+        token = _metric_rec.set(rec)
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec["ms"] = (time.perf_counter() - t0) * 1000.0
+            _metric_rec.reset(token)
+            with self._lock:
+                self.records.append(rec)
+
+    def add(self, field: str, n=1):
+        rec = _metric_rec.get()
+        if rec is not None:
+            rec[field] = rec.get(field, 0) + n
+            return
+        area = _metric_area.get() or "-"
+        with self._lock:
+            counters = self.area_counters.setdefault(area, {})
+            counters[field] = counters.get(field, 0) + n
+
+    def report(self, extra=None) -> dict:
+        with self._lock:
+            records = list(self.records)
+            area_counters = copy.deepcopy(self.area_counters)
+
+        stages = {}
+        for r in records:
+            stages.setdefault(r["stage"], []).append(r)
+
+        areas = {}
+        for r in records:
+            if r["area"]:
+                areas.setdefault(r["area"], []).append(r)
+        per_area = {}
+        for area in sorted(set(areas) | set(area_counters)):
+            recs = areas.get(area, [])
+            entry = {"stages": {name: _summarize([r for r in recs if r["stage"] == name])
+                                for name in sorted({r["stage"] for r in recs})}}
+            entry["total"] = _summarize(recs)
+            for f, n in area_counters.get(area, {}).items():
+                entry["total"][f] = entry["total"].get(f, 0) + n
+            per_area[area] = entry
+
+        area_totals = sorted(a["total"]["total_ms"] for a in per_area.values())
+        report = {
+            "started_at": datetime.fromtimestamp(self.started, JST).isoformat(),
+            "wall_sec": round(time.time() - self.started, 2),
+            "stages": {name: _summarize(recs) for name, recs in sorted(stages.items())},
+            "areas": per_area,
+            "area_total_ms": {
+                "p50": round(_percentile(area_totals, 50), 1),
+                "p90": round(_percentile(area_totals, 90), 1),
+                "max": round(area_totals[-1], 1) if area_totals else 0.0,
+            },
+            "totals": _summarize(records),
+        }
+        for counters in area_counters.values():
+            for f, n in counters.items():
+                report["totals"][f] = report["totals"].get(f, 0) + n
+        if extra:
+            report.update(extra)
+        return report
+
+METRICS = RunMetrics()
+
+def metric_add(field: str, n=1):
+    METRICS.add(field, n)
+
+def instrumented(stage_name: str):
+    """decorator: run the function inside METRICS.stage(stage_name)"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with METRICS.stage(stage_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+# =========================
+# HTTP client (pooled)
+# =========================
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def http_session() -> requests.Session:
+    """one keep-alive connection pool per host (sized to the I/O pool) shared by every call"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            sess = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=len(HTTP_READ_TIMEOUT) + 2, pool_maxsize=MAX_WORKERS)
+            sess.mount("https://", adapter)
+            sess.mount("http://", adapter)
+            sess.headers["Accept-Encoding"] = "gzip, deflate"
+            _http_session = sess
+        return _http_session
+
+def http_timeout(upstream: str, read=None):
+    """(connect, read) timeout; read defaults to the upstream's HTTP_READ_TIMEOUT"""
+    return (HTTP_CONNECT_TIMEOUT, read or HTTP_READ_TIMEOUT.get(upstream, 30.0))
+
+def wire_bytes(res) -> int:
+    """bytes actually received (compressed size when gzip was negotiated)"""
+    try:
+        n = res.raw.tell()
+        if n:
+            return n
+    except Exception:
+        pass
+    return len(res.content)
+
+# =========================
+# Upstream guard (rate limit + circuit breaker)
+# =========================
+class UpstreamOpen(Exception):
+    """circuit breaker is open -> caller takes its fallback path immediately"""
+
+def _retry_after_seconds(value):
+    """Retry-After header (delta-seconds or HTTP-date) -> seconds, None if absent/unparsable"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        dt = email.utils.parsedate_to_datetime(value)
+        return max(0.0, (dt - datetime.now(timezone.utc)).total_seconds())
+    except Exception:
+        return None
+
+class UpstreamGuard:
+    """
+    Shared by every call to one upstream host.
+    - token bucket: at most `rate` req/sec (burst `burst`); Retry-After pauses the whole bucket
+    - circuit breaker: `failures` consecutive failures -> open for `cooldown` sec,
+      then one half-open probe decides whether to close again
+    """
+    def __init__(self, name: str, rate: float, burst: int, failures: int, cooldown: float):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.failure_threshold = max(1, failures)
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._consecutive = 0
+        self._opened_at = None
+        self._probing = False
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.trips = 0
+
+    def before_call(self):
+        """raises UpstreamOpen while the breaker is open; otherwise waits for a token"""
+        with self._lock:
+            if self._opened_at is not None:
+                if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                    self.rejected += 1
+                    raise UpstreamOpen(self.name)
+                self._probing = True  # half-open: this call is the probe
+            self.calls += 1
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self.rate > 0:
+                    self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self.rate <= 0 or self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(min(wait, 5.0))
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            self.failures += 1
+            self._consecutive += 1
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + min(retry_after, RETRY_AFTER_MAX_SEC))
+            if self._probing or (self._opened_at is None and self._consecutive >= self.failure_threshold):
+                if not self._probing:
+                    self.trips += 1
+                    print(f"⚡ circuit open: {self.name} ({self._consecutive}連続失敗 → {int(self.cooldown)}秒スキップ)", flush=True)
+                self._opened_at = now
+                self._probing = False
+
+    def reset(self):
+        with self._lock:
+            self._tokens = float(self.burst)
+            self._last = time.monotonic()
+            self._paused_until = 0.0
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+            self.calls = self.failures = self.rejected = self.trips = 0
+
+    def stats_line(self) -> str:
+        state = "open" if self._opened_at is not None else "closed"
+        return f"{self.name}: calls={self.calls} fail={self.failures} skipped={self.rejected} trips={self.trips} ({state})"
+
+UPSTREAMS = {
+    name: UpstreamGuard(name, rate, burst, BREAKER_FAILURES, BREAKER_COOLDOWN_SEC)
+    for name, (rate, burst) in UPSTREAM_RATE.items()
+}
+
+def _is_upstream_failure(status_code: int) -> bool:
+    # 429 / 5xx = upstream trouble; other 4xx = our request (upstream is alive)
+    return status_code == 429 or status_code >= 500
+
+def guarded_get(upstream: str, url: str, timeout=None, headers=None):
+    """GET through the upstream guard -> Response, None on failure / open breaker"""
+    guard = UPSTREAMS[upstream]
+    try:
+        guard.before_call()
+    except UpstreamOpen:
+        return None
+    try:
+        res = http_session().get(url, headers=headers, timeout=http_timeout(upstream, timeout))
+        metric_add("bytes_in", wire_bytes(res))
+    except Exception:
+        guard.record_failure()
+        return None
+    if _is_upstream_failure(res.status_code):
+        guard.record_failure(_retry_after_seconds(res.headers.get("Retry-After")))
+    else:
+        guard.record_success()
+    return res
+
+def guarded_get_json(upstream: str, url: str, timeout=None):
+    """GET -> parsed JSON (raises on failure / open breaker / HTTP error)"""
+    res = guarded_get(upstream, url, timeout)
+    if res is None:
+        raise RuntimeError(f"{upstream} unavailable: {url}")
+    res.raise_for_status()
+    return json.loads(res.content.decode("utf-8"))
+
+# --- conditional GET cache (ETag / Last-Modified, on disk) ---
+def _http_cache_path(url: str) -> str:
+    return os.path.join(HTTP_CACHE_DIR, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+def conditional_get_json(upstream: str, url: str, timeout=None):
+    """
+    guarded_get_json that revalidates the previous response:
+    304 -> cached body (no download), 200 -> body stored with its validators.
+    """
+    if not HTTP_CACHE:
+        return guarded_get_json(upstream, url, timeout)
+    path = _http_cache_path(url)
+    entry = _load_json(path) or {}
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    res = guarded_get(upstream, url, timeout, headers=headers or None)
+    if res is None:
+        raise RuntimeError(f"{upstream} unavailable: {url}")
+    if res.status_code == 304 and "body" in entry:
+        metric_add("cache_hits")
+        return json.loads(entry["body"])
+    res.raise_for_status()
+    body = res.content.decode("utf-8")
+    data = json.loads(body)
+    validators = {"etag": res.headers.get("ETag"), "last_modified": res.headers.get("Last-Modified")}
+    if any(validators.values()):
+        try:
+            os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+            raw = json.dumps({"url": url, **validators, "body": body}, ensure_ascii=False)
+            _write_atomic(path, raw.encode("utf-8"))
+        except Exception:
+            pass  # cache is best effort
+    return data
+
+# =========================
+# Per-run fetch cache (single-flight)
+# =========================
+class RunCache:
+    """
+    Thread-safe per-run memo.
+    Same key -> exactly one in-flight fetch; concurrent callers wait and reuse its result.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> {"done": Event, "value": ..., "error": ...}
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_fetch(self, key, fetch_fn):
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = {"done": threading.Event(), "value": None, "error": None}
+                self._entries[key] = entry
+                self.misses += 1
+            else:
+                self.hits += 1
+                metric_add("cache_hits")
+
+        if owner:
+            try:
+                entry["value"] = fetch_fn()
+            except Exception as e:
+                entry["error"] = e
+            finally:
+                entry["done"].set()
+        else:
+            entry["done"].wait()
+
+        if entry["error"] is not None:
+            raise entry["error"]
+        return entry["value"]
+
+    def put(self, key, value):
+        """seed a value fetched elsewhere (e.g. bulk prefetch)"""
+        entry = {"done": threading.Event(), "value": value, "error": None}
+        entry["done"].set()
+        with self._lock:
+            self._entries[key] = entry
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self.hits = 0
+            self.misses = 0
+
+    def stats_line(self) -> str:
+        return f"{self.name}: hit={self.hits} miss={self.misses}"
+
+JMA_FORECAST_CACHE = RunCache("JMA forecast")
+JMA_WARNING_CACHE = RunCache("JMA warning")
+OPENMETEO_CACHE = RunCache("Open-Meteo")
+RUN_CACHES = [JMA_FORECAST_CACHE, JMA_WARNING_CACHE, OPENMETEO_CACHE]
+
 # =========================
 # JMA / AMeDAS
 # =========================
+@instrumented("amedas")
 def get_amedas_daily_stats(amedas_code: str):
     """today 0:00 ~ now from 1h data: {max, min}"""
     if not amedas_code:
         return None
     today_str = datetime.now(JST).strftime("%Y%m%d")
-    url = f"https://www.jma.go.jp/bosai/amedas/data/point/{amedas_code}/{today_str}_1h.json"
+    url = f"{JMA_BASE_URL}/bosai/amedas/data/point/{amedas_code}/{today_str}_1h.json"
     try:
-        with urllib.request.urlopen(url, timeout=10) as res:
-            data = json.loads(res.read().decode("utf-8"))
+        data = guarded_get_json("jma", url)
         temps = []
         for _, vals in data.items():
             if isinstance(vals, dict) and "temp" in vals:
@@ -169,21 +669,25 @@ def get_amedas_daily_stats(amedas_code: str):
         return None
     return None
 
-def get_jma_forecast_data(area_code: str):
+# station -> {max, min} (or None), filled once per run by prefetch_amedas_stats
+AMEDAS_STATS = {}
+
+async def prefetch_amedas_stats(areas: dict):
+    """every distinct station's _1h.json once, in parallel, before any area needs it"""
+    codes = list(dict.fromkeys(a.get("amedas_code") for a in areas.values() if a.get("amedas_code")))
+    stats = await asyncio.gather(*[run_io("jma", get_amedas_daily_stats, c) for c in codes])
+    AMEDAS_STATS.update(zip(codes, stats))
+    print(f"🌡️ AMeDAS: {sum(1 for x in stats if x)}/{len(codes)} 地点", flush=True)
+
+def fetch_jma_daily_db(area_code: str):
     """
-    returns (daily_db, warning_text)
     daily_db[YYYY-MM-DD] = {"code":..., "rain_raw":[...], "temp_raw":[...], "temp_summary":{"min":..,"max":..}}
     """
-    forecast_url = f"https://www.jma.go.jp/bosai/forecast/data/forecast/{area_code}.json"
-    warning_url = f"https://www.jma.go.jp/bosai/warning/data/warning/{area_code}.json"
-
+    forecast_url = f"{JMA_BASE_URL}/bosai/forecast/data/forecast/{area_code}.json"
     daily_db = {}
-    warning_text = "特になし"
 
-    # forecast
     try:
-        with urllib.request.urlopen(forecast_url, timeout=15) as res:
-            data = json.loads(res.read().decode("utf-8"))
+        data = conditional_get_json("jma", forecast_url)
 
         # short term details in data[0]
         ts_weather = data[0]["timeSeries"][0]
@@ -246,10 +750,13 @@ def get_jma_forecast_data(area_code: str):
     except Exception as e:
         print(f"JMA Parse Error ({area_code}): {e}")
 
-    # warning
+    return daily_db
+
+def fetch_jma_warning_text(area_code: str):
+    warning_url = f"{JMA_BASE_URL}/bosai/warning/data/warning/{area_code}.json"
+    warning_text = "特になし"
     try:
-        with urllib.request.urlopen(warning_url, timeout=8) as res:
-            w_data = json.loads(res.read().decode("utf-8"))
+        w_data = conditional_get_json("jma", warning_url)
         if isinstance(w_data, dict) and "warnings" in w_data:
             for w in w_data["warnings"]:
                 if w.get("status") not in ["発表なし", "解除"]:
@@ -257,117 +764,184 @@ def get_jma_forecast_data(area_code: str):
                     break
     except Exception:
         pass
+    return warning_text
 
-    return daily_db, warning_text
+@instrumented("jma_forecast")
+def get_jma_daily_db(area_code: str):
+    """shared per run: areas with the same jma_code reuse one download/parse (treat as read-only)"""
+    return JMA_FORECAST_CACHE.get_or_fetch(area_code, lambda: fetch_jma_daily_db(area_code))
+
+@instrumented("jma_warning")
+def get_jma_warning_text(area_code: str):
+    return JMA_WARNING_CACHE.get_or_fetch(area_code, lambda: fetch_jma_warning_text(area_code))
+
+def get_jma_forecast_data(area_code: str):
+    """returns (daily_db, warning_text)"""
+    return get_jma_daily_db(area_code), get_jma_warning_text(area_code)
 
 # =========================
 # Open-Meteo (hourly)
 # =========================
-def fetch_openmeteo_hourly(lat: float, lon: float, days: int = 7):
-    url = (
-        "https://api.open-meteo.com/v1/forecast"
-        f"?latitude={lat}&longitude={lon}"
-        "&hourly=temperature_2m,relative_humidity_2m,precipitation_probability,weathercode"
+OPENMETEO_HOURLY_VARS = "temperature_2m,relative_humidity_2m,precipitation_probability,weathercode"
+
+def _openmeteo_url(lats: str, lons: str, days: int) -> str:
+    return (
+        f"{OPENMETEO_BASE_URL}/v1/forecast"
+        f"?latitude={lats}&longitude={lons}"
+        f"&hourly={OPENMETEO_HOURLY_VARS}"
         "&timezone=Asia%2FTokyo"
         f"&forecast_days={days}"
     )
+
+def fetch_openmeteo_hourly(lat: float, lon: float, days: int = 7):
+    url = _openmeteo_url(str(lat), str(lon), days)
+    res = guarded_get("openmeteo", url)
     try:
-        res = requests.get(url, timeout=15)
-        if res.status_code == 200:
+        if res is not None and res.status_code == 200:
             return res.json()
     except Exception:
         return None
     return None
 
-def build_slot_weather(openmeteo_json, target_dt: datetime):
-    if not openmeteo_json:
-        return None
+@instrumented("openmeteo_bulk")
+def prefetch_openmeteo_hourly(areas: dict, days: int = 7):
+    """
+    Bulk stage before area processing: one multi-location request per chunk
+    (comma-separated latitude/longitude -> result array in the same order).
+    Each area's slice is seeded into OPENMETEO_CACHE; areas missing from the
+    bulk result fall back to the per-area fetch in get_openmeteo_hourly.
+    """
+    coords = []
+    for a in areas.values():
+        c = (a["lat"], a["lon"])
+        if c not in coords:
+            coords.append(c)
+
+    size = max(1, OPENMETEO_BATCH_SIZE)
+    seeded = 0
+    for start in range(0, len(coords), size):
+        chunk = coords[start:start + size]
+        url = _openmeteo_url(
+            ",".join(str(lat) for lat, _ in chunk),
+            ",".join(str(lon) for _, lon in chunk),
+            days,
+        )
+        res = guarded_get("openmeteo", url)
+        try:
+            if res is None or res.status_code != 200:
+                continue
+            data = res.json()
+        except Exception:
+            continue
 
-    hourly = openmeteo_json.get("hourly", {})
-    times = hourly.get("time", [])
-    temps = hourly.get("temperature_2m", [])
-    hums = hourly.get("relative_humidity_2m", [])
-    pops = hourly.get("precipitation_probability", [])
-    wcodes = hourly.get("weathercode", [])
+        # single location -> object, multiple -> array
+        results = data if isinstance(data, list) else [data]
+        if len(results) != len(chunk):
+            continue
+        for (lat, lon), one in zip(chunk, results):
+            if isinstance(one, dict) and one.get("hourly"):
+                OPENMETEO_CACHE.put((lat, lon, days), one)
+                seeded += 1
 
-    date_str = target_dt.strftime("%Y-%m-%d")
-    idxs = [i for i, t in enumerate(times) if isinstance(t, str) and t.startswith(date_str)]
-    if not idxs:
-        return None
+    print(f"🌤️ Open-Meteo bulk: {seeded}/{len(coords)} 地点", flush=True)
+    return seeded
 
-    def slot_pack(start_h, end_h, prefer_hour):
-        ids = []
-        for gi in idxs:
+@instrumented("openmeteo")
+def get_openmeteo_hourly(lat: float, lon: float, days: int = 7):
+    """bulk-prefetched slice if present, otherwise per-area fetch (shared per run)"""
+    return OPENMETEO_CACHE.get_or_fetch((lat, lon, days), lambda: fetch_openmeteo_hourly(lat, lon, days))
+
+class HourlyIndex:
+    """
+    Open-Meteo hourly response parsed once per area.
+    - columns: array('d') per variable, NaN = missing
+    - day_rows[YYYY-MM-DD]: array('i') of 24 row indexes by hour, -1 = missing
+    """
+    __slots__ = ("day_rows", "temp", "hum", "pop", "wcode")
+
+    def __init__(self, openmeteo_json):
+        hourly = (openmeteo_json or {}).get("hourly", {}) or {}
+        times = hourly.get("time", []) or []
+        n = len(times)
+
+        def column(name):
+            src = hourly.get(name, []) or []
+            col = array("d", bytes(8 * n))
+            for i in range(n):
+                try:
+                    col[i] = float(src[i])
+                except Exception:
+                    col[i] = math.nan
+            return col
+
+        self.temp = column("temperature_2m")
+        self.hum = column("relative_humidity_2m")
+        self.pop = column("precipitation_probability")
+        self.wcode = column("weathercode")
+
+        self.day_rows = {}
+        for i, t in enumerate(times):
+            if not isinstance(t, str) or "T" not in t:
+                continue
+            date_str, _, hm = t.partition("T")
             try:
-                hh = int(times[gi].split("T")[1].split(":")[0])
+                hh = int(hm.split(":")[0])
             except Exception:
                 continue
-            if start_h <= hh < end_h:
-                ids.append(gi)
+            if not 0 <= hh < 24:
+                continue
+            rows = self.day_rows.get(date_str)
+            if rows is None:
+                rows = self.day_rows[date_str] = array("i", [-1] * 24)
+            if rows[hh] < 0:
+                rows[hh] = i
+
+def index_openmeteo_hourly(openmeteo_json):
+    if not openmeteo_json:
+        return None
+    if isinstance(openmeteo_json, HourlyIndex):
+        return openmeteo_json
+    return HourlyIndex(openmeteo_json)
+
+def _valid(col, rows):
+    return [v for v in (col[r] for r in rows) if not math.isnan(v)]
+
+def build_slot_weather(openmeteo_json, target_dt: datetime):
+    """openmeteo_json: raw response or HourlyIndex (preferred; build once per area)"""
+    idx = index_openmeteo_hourly(openmeteo_json)
+    if idx is None:
+        return None
+
+    day_rows = idx.day_rows.get(target_dt.strftime("%Y-%m-%d"))
+    if day_rows is None:
+        return None
 
-        if not ids:
+    def slot_pack(start_h, end_h, prefer_hour):
+        hours = [h for h in range(start_h, end_h) if day_rows[h] >= 0]
+        if not hours:
             return {"weather":"☁️","temp":"-","temp_high":"-","temp_low":"-","humidity":"-","rain":"-","wcode":None}
 
-        # representative hour
-        best_k = None
-        best_diff = 10**9
-        for gi in ids:
-            try:
-                hh = int(times[gi].split("T")[1].split(":")[0])
-                d = abs(hh - prefer_hour)
-                if d < best_diff:
-                    best_diff = d
-                    best_k = gi
-            except Exception:
-                pass
+        rows = [day_rows[h] for h in hours]
+        # representative hour (closest to prefer_hour, earliest on tie)
+        best_k = day_rows[min(hours, key=lambda h: abs(h - prefer_hour))]
 
-        tvals = []
-        for gi in ids:
-            try:
-                tvals.append(float(temps[gi]))
-            except Exception:
-                pass
+        tvals = _valid(idx.temp, rows)
         t_high = round(max(tvals)) if tvals else None
         t_low = round(min(tvals)) if tvals else None
 
-        t_rep = None
-        if best_k is not None:
-            try:
-                t_rep = round(float(temps[best_k]))
-            except Exception:
-                t_rep = None
+        t_rep = None if math.isnan(idx.temp[best_k]) else round(idx.temp[best_k])
         if t_rep is None and tvals:
             t_rep = round(sum(tvals)/len(tvals))
 
-        hvals = []
-        for gi in ids:
-            try:
-                hvals.append(float(hums[gi]))
-            except Exception:
-                pass
-        h_rep = None
-        if best_k is not None:
-            try:
-                h_rep = float(hums[best_k])
-            except Exception:
-                h_rep = None
+        hvals = _valid(idx.hum, rows)
+        h_rep = None if math.isnan(idx.hum[best_k]) else idx.hum[best_k]
         if h_rep is None and hvals:
             h_rep = sum(hvals)/len(hvals)
 
-        pvals = []
-        for gi in ids:
-            try:
-                pvals.append(float(pops[gi]))
-            except Exception:
-                pass
+        pvals = _valid(idx.pop, rows)
         p_max = max(pvals) if pvals else None
 
-        wcode_val = None
-        if best_k is not None:
-            try:
-                wcode_val = int(wcodes[best_k])
-            except Exception:
-                wcode_val = None
+        wcode_val = None if math.isnan(idx.wcode[best_k]) else int(idx.wcode[best_k])
         emoji = get_weather_emoji_openmeteo(wcode_val) if wcode_val is not None else "☁️"
 
         return {
@@ -389,55 +963,253 @@ def build_slot_weather(openmeteo_json, target_dt: datetime):
 # =========================
 # Gemini (optional)
 # =========================
-def _post_json(url, headers, payload, timeout=60, retry=3, backoff=2.0):
+def _post_json(url, headers, payload, timeout=None, retry=3, backoff=2.0, upstream="gemini"):
+    guard = UPSTREAMS[upstream]
     for i in range(retry):
         try:
-            res = requests.post(url, headers=headers, json=payload, timeout=timeout)
+            guard.before_call()
+        except UpstreamOpen:
+            return None  # breaker open -> fallback now, no retry sleeps
+
+        if i > 0:
+            metric_add("retries")
+        retry_after = None
+        try:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            metric_add("bytes_out", len(body))
+            res = http_session().post(url, headers=headers, data=body, timeout=http_timeout(upstream, timeout))
+            metric_add("bytes_in", wire_bytes(res))
             if res.status_code == 200:
-                return res.json()
+                data = res.json()
+                guard.record_success()
+                return data
+            if not _is_upstream_failure(res.status_code):
+                guard.record_success()
+                return None  # bad request etc.: retrying won't help
+            retry_after = _retry_after_seconds(res.headers.get("Retry-After"))
+            guard.record_failure(retry_after)
         except Exception:
-            pass
-        time.sleep(backoff ** i)
+            guard.record_failure()
+
+        if i < retry - 1:
+            time.sleep(min(max(backoff ** i, retry_after or 0), RETRY_AFTER_MAX_SEC))
     return None
 
-def call_gemini_search(prompt: str):
-    if not API_KEY:
-        return None
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={API_KEY}"
-    headers = {"Content-Type": "application/json"}
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}],
-        "tools": [{"googleSearch": {}}],
-        "generationConfig": {"temperature": 0.4}
-    }
-    data = _post_json(url, headers, payload, timeout=75, retry=3)
-    if not data:
+# --- response cache ---
+_gemini_cache_lock = threading.Lock()
+GEMINI_CACHE_STATS = {"hit": 0, "miss": 0, "store": 0, "evict": 0, "reject": 0}
+
+def _gemini_cache_key(payload) -> str:
+    # same model + prompt + generationConfig + tools -> same key
+    raw = json.dumps({"model": GEMINI_MODEL, "payload": payload}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _gemini_cache_path(key: str) -> str:
+    return os.path.join(GEMINI_CACHE_DIR, key[:2], key + ".json")
+
+def gemini_cache_get(key: str, kind: str):
+    if not GEMINI_CACHE:
         return None
+    path = _gemini_cache_path(key)
+    ttl = GEMINI_CACHE_TTL_HOURS.get(kind, 0) * 3600
     try:
-        return data["candidates"][0]["content"]["parts"][0]["text"]
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        if time.time() - float(entry["created"]) > ttl:
+            raise KeyError("expired")
+        os.utime(path)  # LRU: mtime = last use
+        text = entry["text"]
     except Exception:
+        with _gemini_cache_lock:
+            GEMINI_CACHE_STATS["miss"] += 1
         return None
+    with _gemini_cache_lock:
+        GEMINI_CACHE_STATS["hit"] += 1
+    metric_add("cache_hits")
+    return text
+
+def gemini_cache_put(key: str, kind: str, text: str):
+    if not GEMINI_CACHE or not text:
+        return
+    path = _gemini_cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "kind": kind, "text": text}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except Exception:
+        return
+    with _gemini_cache_lock:
+        GEMINI_CACHE_STATS["store"] += 1
+
+def gemini_cache_prune():
+    """drop expired entries, then least-recently-used ones until under GEMINI_CACHE_MAX_MB"""
+    if not GEMINI_CACHE or not os.path.isdir(GEMINI_CACHE_DIR):
+        return
+    max_ttl = max(GEMINI_CACHE_TTL_HOURS.values()) * 3600
+    now = time.time()
+    files = []
+    for root, _, names in os.walk(GEMINI_CACHE_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    limit = GEMINI_CACHE_MAX_MB * 1024 * 1024
+    for mtime, size, path in sorted(files):
+        if total <= limit and now - mtime <= max_ttl:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            GEMINI_CACHE_STATS["evict"] += 1
+        except OSError:
+            pass
+
+def _gemini_reject():
+    with _gemini_cache_lock:
+        GEMINI_CACHE_STATS["reject"] += 1
 
-def call_gemini_json(prompt: str):
+def _gemini_generate(payload, cache_kind: str, accept=None):
+    """
+    accept(text) -> bool: the caller's parse check. Only accepted responses are cached,
+    a cached one that fails it is fetched again (a broken answer is never replayed for the TTL).
+    """
     if not API_KEY:
         return None
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={API_KEY}"
+    accept = accept or (lambda t: bool(t.strip()))
+    key = _gemini_cache_key(payload)
+    cached = gemini_cache_get(key, cache_kind)
+    if cached is not None:
+        if accept(cached):
+            return cached
+        _gemini_reject()
+
+    url = f"{GEMINI_BASE_URL}/v1beta/models/{GEMINI_MODEL}:generateContent?key={API_KEY}"
     headers = {"Content-Type": "application/json"}
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {"temperature": 0.3, "responseMimeType": "application/json"}
-    }
-    data = _post_json(url, headers, payload, timeout=75, retry=3)
+    data = _post_json(url, headers, payload, retry=3)
     if not data:
         return None
+    usage = data.get("usageMetadata") or {}
+    metric_add("tokens_in", int(usage.get("promptTokenCount") or 0))
+    metric_add("tokens_out", int(usage.get("candidatesTokenCount") or 0) + int(usage.get("thoughtsTokenCount") or 0))
+    metric_add("tokens_cached", int(usage.get("cachedContentTokenCount") or 0))
     try:
-        return data["candidates"][0]["content"]["parts"][0]["text"]
+        text = data["candidates"][0]["content"]["parts"][0]["text"]
     except Exception:
         return None
+    if accept(text):
+        gemini_cache_put(key, cache_kind, text)
+    else:
+        _gemini_reject()
+    return text
+
+def _json_object(text):
+    """first {...} block of a Gemini answer as dict, None if absent / not JSON"""
+    try:
+        j = json.loads(extract_json_block(text or ""))
+    except Exception:
+        return None
+    return j if isinstance(j, dict) else None
+
+def call_gemini_search(prompt: str, cache_kind: str = "event_search", accept=None):
+    payload = {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "tools": [{"googleSearch": {}}],
+        "generationConfig": {"temperature": 0.4}
+    }
+    return _gemini_generate(payload, cache_kind, accept)
+
+def call_gemini_json(prompt: str, cache_kind: str = "json", system: str = None, accept=None):
+    payload = {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "generationConfig": {"temperature": 0.3, "responseMimeType": "application/json"}
+    }
+    if system:
+        # static prefix -> same leading tokens on every call (implicit context cache)
+        payload["systemInstruction"] = {"parts": [{"text": system}]}
+    return _gemini_generate(payload, cache_kind, accept or (lambda t: _json_object(t) is not None))
 
 # =========================
 # Event/Traffic (AI_DAYS)
 # =========================
+# delimiter format asked from the grounded search (parsed locally, no reformat round trip)
+EVENT_OUTPUT_FORMAT = (
+    "出力形式（厳守）: 日付ごとに見出し行「@@ YYYY-MM-DD」、その下に「- 」で始まる箇条書き。\n"
+    "必ず全日分の見出しを作ること（情報が無い日は「- 特段の検索結果なし」）。\n"
+    "日付が分からない情報は見出し「@@ 不明」の下にまとめること。\n"
+)
+
+_HEAD_MARK_RE = re.compile(r"^(?:@@|#+|■|【)\s*")
+_BOLD_LINE_RE = re.compile(r"^\*\*(.+?)\*\*[:：]?$")
+_DATE_RE = re.compile(r"^(\d{4})[-/年.](\d{1,2})[-/月.](\d{1,2})日?")
+_TAG_RE = re.compile(r"^\[([\w\-]+)\]\s*")
+
+def _heading_text(line: str):
+    """text of a heading line (marker / bold removed); None for bullets and prose"""
+    m = _BOLD_LINE_RE.match(line)
+    if m:
+        body = m.group(1)
+    else:
+        m = _HEAD_MARK_RE.match(line)
+        if not m:
+            return None
+        body = line[m.end():]
+    return _HEAD_MARK_RE.sub("", body.replace("**", "").strip()).strip()  # "## **2026-10-18**", "**【10/18】**"
+
+def parse_dated_bullets(text: str, date_keys, tags=None):
+    """
+    Tolerant line-by-line parser for EVENT_OUTPUT_FORMAT.
+    Headings need a marker (@@, #, ■, 【) or a fully bold line; markdown, YYYY/MM/DD or YYYY年M月D日
+    dates and a missing "[tag]" are accepted. Bullets / prose starting with a date stay items.
+    Returns {tag: {date: "- bullet\n- bullet"}} ("common" = untagged / unknown tag),
+    None if no heading of the period was found (-> caller uses the JSON reformatter).
+    """
+    wanted = set(date_keys)
+    tags = set(tags or [])
+    lines = {t: {d: [] for d in date_keys} for t in tags | {"common"}}
+    current = None
+    found = False
+    for raw in (text or "").splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        head = _heading_text(line)
+        if head is not None:
+            m = _DATE_RE.match(head)
+            if not m:
+                if head.startswith("不明"):
+                    current = None
+                continue  # other headings ("## 交通") keep the current day
+            dk = f"{int(m.group(1)):04d}-{int(m.group(2)):02d}-{int(m.group(3)):02d}"
+            current = dk if dk in wanted else None
+            found = found or current is not None
+            rest = re.sub(r"^\s*[\(（][月火水木金土日]曜?日?[\)）]|[】:：]", "", head[m.end():]).strip()
+            if not rest or current is None:
+                continue
+            line = rest  # "@@ 2026-10-18: 〇〇線 運休" -> bullet of that day
+        if current is None:
+            continue
+        item = re.sub(r"^[\-\•\*・\u2022]+\s*", "", line).replace("**", "").strip()
+        tag = "common"
+        t = _TAG_RE.match(item)
+        if t:
+            item = item[t.end():]
+            tag = t.group(1) if t.group(1) in tags else "common"
+        if item:
+            lines[tag][current].append(f"- {item}")
+    if not found:
+        return None
+    return {t: {d: "\n".join(v) for d, v in by_date.items()} for t, by_date in lines.items()}
+
+def _join_bullets(*parts):
+    return "\n".join(p.strip() for p in parts if p and p.strip())
+
 def fetch_event_traffic_7days(area_name: str, days: int):
     """
     Returns dict[YYYY-MM-DD] = "bullets text"
@@ -458,13 +1230,19 @@ def fetch_event_traffic_7days(area_name: str, days: int):
         "1) 交通: 鉄道/バス/航空の遅延・運休、道路の通行止め、規制、渋滞、事故\n"
         "2) イベント: ライブ/スポーツ/展示会/祭り等（中止/変更も）\n"
         "3) 注意情報: 大雪/強風/警報級など交通に影響しうる情報\n\n"
-        "出力は「日付見出し + 箇条書き」形式で、必ず全日分を作ること。\n"
-        "日付が分からない情報は「不明」にまとめること。\n"
-        "フェイクは書かない。曖昧なら「未確認」と明記。\n"
+        + EVENT_OUTPUT_FORMAT
+        + "フェイクは書かない。曖昧なら「未確認」と明記。\n"
     )
-    text = call_gemini_search(search_prompt)
-    if not text:
-        return {d: "" for d in date_keys}
+    with METRICS.stage("event_search"):
+        text = call_gemini_search(search_prompt, accept=lambda t: parse_dated_bullets(t, date_keys) is not None)
+        if not text:
+            metric_add("fallbacks")
+            return {d: "" for d in date_keys}
+
+    # single pass: the delimited answer is parsed here, the JSON reformat call only if that fails
+    parsed = parse_dated_bullets(text, date_keys)
+    if parsed is not None:
+        return parsed["common"]
 
     json_prompt = (
         "次の文章を解析して、期間内の日数分を必ず埋めたJSONに変換してください。\n"
@@ -478,18 +1256,108 @@ def fetch_event_traffic_7days(area_name: str, days: int):
         + ",\n".join([f'  "{d}": "..."' for d in date_keys])
         + "\n}\n"
     )
-    jtxt = call_gemini_json(json_prompt)
-    if not jtxt:
-        return {d: "" for d in date_keys}
+    with METRICS.stage("event_json"):
+        j = _json_object(call_gemini_json(json_prompt))
+        try:
+            out = {}
+            for d in date_keys:
+                out[d] = (j.get(d) or "").strip()
+            return out
+        except Exception:
+            metric_add("fallbacks")
+            return {d: "" for d in date_keys}
 
-    try:
-        j = json.loads(extract_json_block(jtxt))
-        out = {}
-        for d in date_keys:
-            out[d] = (j.get(d) or "").strip()
-        return out
-    except Exception:
-        return {d: "" for d in date_keys}
+def event_region_groups(areas: dict, max_areas: int = None):
+    """
+    area_key -> {area_key: area_data} of the areas searched together (same region, in areas order);
+    regions larger than max_areas (default EVENT_REGION_MAX_AREAS) are split into consecutive chunks
+    """
+    by_region = {}
+    for key, area in areas.items():
+        region = EVENT_REGION_OF_JMA.get(area["jma_code"], area["jma_code"])
+        by_region.setdefault(region, []).append(key)
+    size = max(1, EVENT_REGION_MAX_AREAS if max_areas is None else min(max_areas, EVENT_REGION_MAX_AREAS))
+    groups = {}
+    for keys in by_region.values():
+        for i in range(0, len(keys), size):
+            members = {k: areas[k] for k in keys[i:i + size]}
+            for k in members:
+                groups[k] = members
+    return groups
+
+def fetch_region_event_traffic(members: dict, days: int):
+    """
+    One search + one conversion for all member areas.
+    Returns dict[area_key][YYYY-MM-DD] = area-specific bullets + region-wide ("common") bullets
+    If unavailable -> all empty
+    """
+    today = datetime.now(JST).date()
+    date_keys = [(today + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+    empty = {k: {d: "" for d in date_keys} for k in members}
+
+    if not API_KEY:
+        return empty
+
+    prefs = list(dict.fromkeys(a["name"].split()[0] for a in members.values()))
+    search_prompt = (
+        "あなたはプロの調査員です。\n"
+        f"対象地域: {'・'.join(prefs)}\n"
+        "サブエリア（キー: 名称）:\n"
+        + "".join(f"- {k}: {a['name']}\n" for k, a in members.items())
+        + f"期間: {date_keys[0]} から {date_keys[-1]}（{days}日）\n\n"
+        "次の情報を、日付ごとに整理して検索してまとめてください。\n"
+        "優先順位:\n"
+        "1) 交通: 鉄道/バス/航空の遅延・運休、道路の通行止め、規制、渋滞、事故\n"
+        "2) イベント: ライブ/スポーツ/展示会/祭り等（中止/変更も）\n"
+        "3) 注意情報: 大雪/強風/警報級など交通に影響しうる情報\n\n"
+        + EVENT_OUTPUT_FORMAT
+        + "各箇条書きの先頭に該当サブエリアのキーを [キー] で付けること（例: - [common] ...）。"
+        "地域全体に影響するもの（広域の鉄道・道路・気象）は [common]。\n"
+        "フェイクは書かない。曖昧なら「未確認」と明記。\n"
+    )
+    with METRICS.stage("event_search"):
+        text = call_gemini_search(search_prompt,
+                                  accept=lambda t: parse_dated_bullets(t, date_keys, tags=list(members)) is not None)
+        if not text:
+            metric_add("fallbacks")
+            return empty
+
+    parsed = parse_dated_bullets(text, date_keys, tags=list(members))
+    if parsed is not None:
+        return {
+            key: {d: _join_bullets(parsed.get(key, {}).get(d), parsed["common"][d]) for d in date_keys}
+            for key in members
+        }
+
+    slot_keys = ["common"] + list(members)
+    json_prompt = (
+        "次の文章を解析して、期間内の日数分を必ず埋めたJSONに変換してください。\n"
+        "キーは日付(YYYY-MM-DD)、値はサブエリアのキーごとのEvent/Traffic要約（箇条書き文字列、改行OK）。\n"
+        "地域全体に影響するものは common。該当が無いサブエリアは空文字。\n"
+        f"期間: {date_keys[0]} から {date_keys[-1]}\n"
+        "文章:\n"
+        + text
+        + "\n\n"
+        "出力はこのJSONのみ:\n"
+        + "{\n"
+        + ",\n".join([f'  "{d}": {{' + ", ".join(f'"{k}": "..."' for k in slot_keys) + "}" for d in date_keys])
+        + "\n}\n"
+    )
+    with METRICS.stage("event_json"):
+        j = _json_object(call_gemini_json(json_prompt))
+        try:
+            out = {}
+            for key in members:
+                out[key] = {}
+                for d in date_keys:
+                    v = j.get(d) or {}
+                    if isinstance(v, str):
+                        v = {"common": v}
+                    out[key][d] = _join_bullets(v.get(key), v.get("common"))
+            return out
+        except Exception:
+            metric_add("fallbacks")
+            return empty
 
 def to_facts_list(event_traffic_text: str, max_items=6):
     if not event_traffic_text:
@@ -539,7 +1407,7 @@ def decide_high_low(area_data, day_data, is_today: bool):
             low_val = min(valid_t)
 
     if is_today:
-        am = get_amedas_daily_stats(area_data.get("amedas_code", ""))
+        am = AMEDAS_STATS.get(area_data.get("amedas_code", ""))  # prefetched, no I/O here
         if am:
             if low_val is None or float(low_val) > am["min"]:
                 low_val = am["min"]
@@ -589,13 +1457,17 @@ def base_rank_for_date(target_dt: datetime):
 # =========================
 # Long-term fallback (safe)
 # =========================
-def get_long_term_text_safe(area_name: str):
-    # Keep short & stable. If Gemini available, enrich.
-    base = (
+def long_term_base_text(area_name: str):
+    return (
         f"エリア: {area_name}\n"
         "向こう数ヶ月は季節の変わり目で天候が変動しやすい時期です。\n"
         "雨・強風・寒暖差で移動需要や外出行動がブレるため、当日朝の最新情報を前提に運用してください。\n"
     )
+
+@instrumented("long_term")
+def get_long_term_text_safe(area_name: str):
+    # Keep short & stable. If Gemini available, enrich.
+    base = long_term_base_text(area_name)
     if not API_KEY:
         return base
 
@@ -605,7 +1477,9 @@ def get_long_term_text_safe(area_name: str):
         "自然な日本語の短い文章でまとめて。\n"
         "JSON形式は禁止。Markdownテキストのみ。\n"
     )
-    res = call_gemini_search(prompt)
+    res = call_gemini_search(prompt, cache_kind="long_term")
+    if not res:
+        metric_add("fallbacks")
     return res.strip() if res else base
 
 def build_long_term_day(target_dt: datetime, long_term_text: str):
@@ -626,6 +1500,7 @@ def build_long_term_day(target_dt: datetime, long_term_text: str):
 
     return {
         "date": full_date,
+        "date_key": target_dt.strftime("%Y-%m-%d"),
         "is_long_term": True,
         "rank": rank,
         "weather_overview": wo,
@@ -640,14 +1515,69 @@ def build_long_term_day(target_dt: datetime, long_term_text: str):
 # =========================
 # AI day generation (optional)
 # =========================
-def generate_ai_day(area_data, target_dt: datetime, jma_day_data, warning_text: str, slot_weather, event_traffic_text: str):
+AI_PROMPT_INTRO = (
+    "あなたは世界トップクラスの戦略コンサルタントです。\n"
+    "以下の事実セットから、5つの職業（taxi/delivery/restaurant/retail/hotel）向けに、\n"
+    "「その職業の意思決定が変わる」具体的な提案を作ってください。\n\n"
+    "【ルール】\n"
+    "- フェイク禁止。事実セットにない固有名詞を勝手に作らない。\n"
+    "- 曖昧なら「未確認」と明記。\n"
+    "- 断定の命令口調は禁止。\n"
+    "- 一般論だけは禁止。必ず事実セット（天候/交通/イベント）に結びつける。\n"
+    "- peak_windows / timeline.*.advice / job_actions は必ず全職業キーを埋める。\n"
+    "- job_actions は「職業別の打ち手（要点）」として各職業1行で高密度（区切りは「｜」推奨）。\n\n"
+)
+
+AI_REPORT_STRUCTURE = (
+    "\n\n【レポート本文（daily_schedule_and_impact）に含めるべき構成】\n"
+    "- ■Event & Traffic（事実セットの範囲で段落分けして要約）\n"
+    "- ■総括（その日全体の読み：短め）\n"
+    "- ■職業別の打ち手（要点）\n"
+    "  ・タクシー: ...\n"
+    "  ・デリバリー: ...\n"
+    "  ・飲食店: ...\n"
+    "  ・小売: ...\n"
+    "  ・ホテル: ...\n\n"
+)
+
+SLOT_NAMES = ["morning", "daytime", "night"]
+SLOT_WEATHER_KEYS = ["weather", "temp", "temp_high", "temp_low", "humidity", "rain"]
+
+def _area_facts_header(area_data) -> str:
+    return "\n".join([
+        "[Area]",
+        area_data["name"],
+        f"特徴: {area_data.get('feature','')}",
+    ])
+
+REPORT_HINT = "レポート本文（改行OK。最後に職業別要点を含める）"
+
+def _schema_hint(full_date: str, overview: dict, slots: dict):
+    # Prepare a schema hint without f-string braces troubles
+    return {
+        "date": full_date,
+        "is_long_term": False,
+        "rank": "S/A/B/C",
+        "weather_overview": dict(overview),
+        "event_traffic_facts": ["(max 6)"],
+        "peak_windows": {k: "" for k in JOB_KEYS},
+        "job_actions": {k: "" for k in JOB_KEYS},
+        "daily_schedule_and_impact": REPORT_HINT,
+        "timeline": {
+            slot_name: {
+                **{k: slots[slot_name][k] for k in SLOT_WEATHER_KEYS},
+                "advice": {k: "" for k in JOB_KEYS}
+            }
+            for slot_name in SLOT_NAMES
+        },
+        "confidence": 0
+    }
+
+def prepare_ai_day(area_data, target_dt: datetime, jma_day_data, warning_text: str, slot_weather, event_traffic_text: str):
     """
-    Returns dict aligned with main.dart model.
-    If Gemini unavailable/fails -> returns None (caller will fallback).
+    Everything generate_ai_day derives before calling Gemini:
+    weather overview defaults, slot weather, facts list and the facts block text.
     """
-    if not API_KEY:
-        return None
-
     date_str = target_dt.strftime("%Y-%m-%d")
     full_date = _date_label(target_dt)
 
@@ -674,11 +1604,7 @@ def generate_ai_day(area_data, target_dt: datetime, jma_day_data, warning_text:
     facts_text_for_ai = "\n".join([f"- {x}" for x in facts_list]) if facts_list else "(特段の情報なし)"
 
     # Build facts block (safe; no braces complexity)
-    facts_block = "\n".join([
-        "[Area]",
-        area_data["name"],
-        f"特徴: {area_data.get('feature','')}",
-        "",
+    day_block = "\n".join([
         "[Date]",
         f"{date_str} / {full_date}",
         "",
@@ -697,112 +1623,165 @@ def generate_ai_day(area_data, target_dt: datetime, jma_day_data, warning_text:
         facts_text_for_ai
     ])
 
-    # Prepare a schema hint without f-string braces troubles
-    schema_hint = {
-        "date": full_date,
-        "is_long_term": False,
-        "rank": "S/A/B/C",
-        "weather_overview": {
-            "condition": w_emoji,
-            "high": f"最高{high}℃",
-            "low": f"最低{low}℃",
-            "rain": rain_display,
-            "rain_am": rain_am,
-            "rain_pm": rain_pm,
-            "rain_night": rain_ng,
-            "warning": warning_text
-        },
-        "event_traffic_facts": ["(max 6)"],
-        "peak_windows": {k: "" for k in JOB_KEYS},
-        "job_actions": {k: "" for k in JOB_KEYS},
-        "daily_schedule_and_impact": "レポート本文（改行OK。最後に職業別要点を含める）",
-        "timeline": {
-            "morning": {
-                "weather": slot_weather["morning"]["weather"],
-                "temp": slot_weather["morning"]["temp"],
-                "temp_high": slot_weather["morning"]["temp_high"],
-                "temp_low": slot_weather["morning"]["temp_low"],
-                "humidity": slot_weather["morning"]["humidity"],
-                "rain": slot_weather["morning"]["rain"],
-                "advice": {k: "" for k in JOB_KEYS}
-            },
-            "daytime": {
-                "weather": slot_weather["daytime"]["weather"],
-                "temp": slot_weather["daytime"]["temp"],
-                "temp_high": slot_weather["daytime"]["temp_high"],
-                "temp_low": slot_weather["daytime"]["temp_low"],
-                "humidity": slot_weather["daytime"]["humidity"],
-                "rain": slot_weather["daytime"]["rain"],
-                "advice": {k: "" for k in JOB_KEYS}
-            },
-            "night": {
-                "weather": slot_weather["night"]["weather"],
-                "temp": slot_weather["night"]["temp"],
-                "temp_high": slot_weather["night"]["temp_high"],
-                "temp_low": slot_weather["night"]["temp_low"],
-                "humidity": slot_weather["night"]["humidity"],
-                "rain": slot_weather["night"]["rain"],
-                "advice": {k: "" for k in JOB_KEYS}
-            }
-        },
-        "confidence": 0
+    overview = {
+        "condition": w_emoji,
+        "high": f"最高{high}℃",
+        "low": f"最低{low}℃",
+        "rain": rain_display,
+        "rain_am": rain_am,
+        "rain_pm": rain_pm,
+        "rain_night": rain_ng,
+        "warning": warning_text
     }
 
-    prompt = (
-        "あなたは世界トップクラスの戦略コンサルタントです。\n"
-        "以下の事実セットから、5つの職業（taxi/delivery/restaurant/retail/hotel）向けに、\n"
-        "「その職業の意思決定が変わる」具体的な提案を作ってください。\n\n"
-        "【ルール】\n"
-        "- フェイク禁止。事実セットにない固有名詞を勝手に作らない。\n"
-        "- 曖昧なら「未確認」と明記。\n"
-        "- 断定の命令口調は禁止。\n"
-        "- 一般論だけは禁止。必ず事実セット（天候/交通/イベント）に結びつける。\n"
-        "- peak_windows / timeline.*.advice / job_actions は必ず全職業キーを埋める。\n"
-        "- job_actions は「職業別の打ち手（要点）」として各職業1行で高密度（区切りは「｜」推奨）。\n\n"
-        "【出力はJSONのみ】\n"
-        "次のスキーマを満たすこと（キー追加は可。ただし最低限これを満たす）。\n\n"
-        + json.dumps(schema_hint, ensure_ascii=False, indent=2)
-        + "\n\n【レポート本文（daily_schedule_and_impact）に含めるべき構成】\n"
-        "- ■Event & Traffic（事実セットの範囲で段落分けして要約）\n"
-        "- ■総括（その日全体の読み：短め）\n"
-        "- ■職業別の打ち手（要点）\n"
-        "  ・タクシー: ...\n"
-        "  ・デリバリー: ...\n"
-        "  ・飲食店: ...\n"
-        "  ・小売: ...\n"
-        "  ・ホテル: ...\n\n"
-        "【事実セット】\n"
-        + facts_block
-    )
+    return {
+        "target_dt": target_dt,
+        "date_str": date_str,
+        "full_date": full_date,
+        "overview": overview,
+        "slot_weather": slot_weather,
+        "facts_list": facts_list,
+        "day_block": day_block,
+        "facts_block": _area_facts_header(area_data) + "\n\n" + day_block,
+    }
 
-    res = call_gemini_json(prompt)
-    if not res:
-        return None
+# --- prompt builder (static part compiled once, sent as systemInstruction) ---
+# schema placeholders: real values are in the facts; echoed placeholders are dropped before finalize
+OVERVIEW_HINT = {
+    "condition": "(事実セットの天気)",
+    "high": "最高..℃",
+    "low": "最低..℃",
+    "rain": "午前..% / 午後..%",
+    "rain_am": "..%",
+    "rain_pm": "..%",
+    "rain_night": "..%",
+    "warning": "(事実セットの警報注意報)"
+}
+SLOT_HINT = {"weather": "(天気)", "temp": "..℃", "temp_high": "..℃", "temp_low": "..℃", "humidity": "..%", "rain": "..%"}
+DATE_HINT = "MM月DD日 (曜)"
+SCHEMA_PLACEHOLDERS = set(OVERVIEW_HINT.values()) | set(SLOT_HINT.values()) | {DATE_HINT}
+
+DAY_OUTPUT_RULE = (
+    "【出力はJSONのみ】\n"
+    "次のスキーマを満たすこと（キー追加は可。ただし最低限これを満たす）。\n"
+    "weather_overview / timeline の天気・気温・湿度・降水は、事実セットの値をそのまま使うこと。\n\n"
+)
+BATCH_OUTPUT_RULE = (
+    "【出力はJSONのみ】\n"
+    '{"days": [...]} の形で、事実セットの日別ブロックごとに1要素（日付順）を出力すること。\n'
+    "各要素は date_key（YYYY-MM-DD）を必ず含め、次のスキーマを満たすこと（キー追加は可。ただし最低限これを満たす）。\n"
+    "weather_overview / timeline の天気・気温・湿度・降水は、その日の事実セットの値をそのまま使うこと。\n\n"
+)
+
+class PromptBuilder:
+    """
+    Rules, output format, schema and report structure never change within a run:
+    compiled once (schema minified) and sent as systemInstruction, so every call shares
+    the same prefix (Gemini implicit context cache) and contents carry only the facts.
+    Sizes are tracked against the previous layout (one user prompt, schema with indent=2).
+    """
+    def __init__(self):
+        schema = _schema_hint(DATE_HINT, OVERVIEW_HINT, {s: SLOT_HINT for s in SLOT_NAMES})
+        batch_schema = {"date_key": "YYYY-MM-DD", **schema}
+        self.system = {
+            "day": self._compile(DAY_OUTPUT_RULE, schema),
+            "batch": self._compile(BATCH_OUTPUT_RULE, batch_schema),
+        }
+        self._legacy_system_chars = {
+            "day": len(self._compile(DAY_OUTPUT_RULE, schema, indent=2)),
+            "batch": len(self._compile(BATCH_OUTPUT_RULE, batch_schema, indent=2)),
+        }
+        self.version = hashlib.sha256("\n".join(self.system.values()).encode("utf-8")).hexdigest()[:16]
+        self._lock = threading.Lock()
+        self.reset()
 
-    try:
-        j = json.loads(extract_json_block(res))
-    except Exception:
+    def reset(self):
+        self.stats = {"prompts": 0, "system_chars": 0, "user_chars": 0, "legacy_chars": 0}
+
+    @staticmethod
+    def _compile(output_rule: str, schema, indent=None) -> str:
+        if indent:
+            schema_text = json.dumps(schema, ensure_ascii=False, indent=indent)
+        else:
+            schema_text = json.dumps(schema, ensure_ascii=False, separators=(",", ":"))
+        return AI_PROMPT_INTRO + output_rule + schema_text + AI_REPORT_STRUCTURE
+
+    def _track(self, kind: str, user: str):
+        system = self.system[kind]
+        metric_add("prompt_chars", len(system) + len(user))
+        with self._lock:
+            self.stats["prompts"] += 1
+            self.stats["system_chars"] += len(system)
+            self.stats["user_chars"] += len(user)
+            self.stats["legacy_chars"] += self._legacy_system_chars[kind] + len(user)
+        return system, user
+
+    def day(self, ctx):
+        """(systemInstruction, contents text) for one day"""
+        return self._track("day", "【事実セット】\n" + ctx["facts_block"])
+
+    def days(self, area_data, ctxs):
+        """(systemInstruction, contents text) for several days: shared area header, per-day fact blocks"""
+        day_blocks = [f"=== Day {n} ({ctx['date_str']}) ===\n" + ctx["day_block"] for n, ctx in enumerate(ctxs, start=1)]
+        user = (
+            "【事実セット（共通）】\n"
+            + _area_facts_header(area_data)
+            + f"\n\n【事実セット（日別）】（計{len(ctxs)}日）\n"
+            + "\n\n".join(day_blocks)
+        )
+        return self._track("batch", user)
+
+    def report(self):
+        with self._lock:
+            st = dict(self.stats)
+        sent = st["system_chars"] + st["user_chars"]
+        st["saved_chars"] = st["legacy_chars"] - sent
+        st["saved_pct"] = round(100.0 * st["saved_chars"] / st["legacy_chars"], 1) if st["legacy_chars"] else 0.0
+        st["avg_chars"] = round(sent / st["prompts"]) if st["prompts"] else 0
+        st["system_instruction_chars"] = {k: len(v) for k, v in self.system.items()}
+        return st
+
+_prompt_builder = None
+
+def prompt_builder() -> PromptBuilder:
+    global _prompt_builder
+    if _prompt_builder is None:
+        _prompt_builder = PromptBuilder()
+    return _prompt_builder
+
+def _drop_placeholders(obj):
+    """schema placeholders echoed back by the model -> removed, finalize fills the real values"""
+    if obj.get("date") in SCHEMA_PLACEHOLDERS:
+        obj.pop("date")
+    wo = obj.get("weather_overview")
+    if isinstance(wo, dict):
+        obj["weather_overview"] = {k: v for k, v in wo.items() if v not in SCHEMA_PLACEHOLDERS}
+    tl = obj.get("timeline")
+    if isinstance(tl, dict):
+        for slot_src in tl.values():
+            if isinstance(slot_src, dict):
+                for k in SLOT_WEATHER_KEYS:
+                    if slot_src.get(k) in SCHEMA_PLACEHOLDERS:
+                        slot_src.pop(k)
+    return obj
+
+def finalize_ai_day(j, ctx):
+    """sanitize & ensure schema for main.dart"""
+    if not isinstance(j, dict):
         return None
 
-    # ---- sanitize & ensure schema for main.dart ----
-    j.setdefault("date", full_date)
+    j["date"] = ctx["full_date"]  # always ours: the model may echo the schema placeholder
     j.setdefault("is_long_term", False)
-    j.setdefault("rank", base_rank_for_date(target_dt))
+    j.setdefault("rank", base_rank_for_date(ctx["target_dt"]))
 
     wo = j.get("weather_overview") or {}
-    wo.setdefault("condition", w_emoji)
-    wo.setdefault("high", f"最高{high}℃")
-    wo.setdefault("low", f"最低{low}℃")
-    wo.setdefault("rain", rain_display)
-    wo.setdefault("rain_am", rain_am)
-    wo.setdefault("rain_pm", rain_pm)
-    wo.setdefault("rain_night", rain_ng)
-    wo.setdefault("warning", warning_text)
+    for k, v in ctx["overview"].items():
+        wo.setdefault(k, v)
     j["weather_overview"] = wo
 
     et = j.get("event_traffic_facts")
     if not isinstance(et, list):
-        et = facts_list
+        et = ctx["facts_list"]
     j["event_traffic_facts"] = [str(x).strip() for x in et if str(x).strip()][:6]
 
     pw = j.get("peak_windows") or {}
@@ -817,10 +1796,11 @@ def generate_ai_day(area_data, target_dt: datetime, jma_day_data, warning_text:
 
     j.setdefault("daily_schedule_and_impact", "")
 
+    slot_weather = ctx["slot_weather"]
     tl = j.get("timeline")
     if not isinstance(tl, dict):
         tl = {}
-    for slot_name in ["morning", "daytime", "night"]:
+    for slot_name in SLOT_NAMES:
         slot_src = tl.get(slot_name) if isinstance(tl.get(slot_name), dict) else {}
         base = slot_weather.get(slot_name, {})
         slot_src["weather"] = str(slot_src.get("weather") or base.get("weather") or "☁️")
@@ -842,75 +1822,1230 @@ def generate_ai_day(area_data, target_dt: datetime, jma_day_data, warning_text:
 
     return j
 
+def generate_ai_day(area_data, target_dt: datetime, jma_day_data, warning_text: str, slot_weather, event_traffic_text: str):
+    """
+    Returns dict aligned with main.dart model.
+    If Gemini unavailable/fails -> returns None (caller will fallback).
+    """
+    if not API_KEY:
+        return None
+
+    ctx = prepare_ai_day(area_data, target_dt, jma_day_data, warning_text, slot_weather, event_traffic_text)
+    return _generate_from_ctx(ctx)
+
+def _parse_ai_day(text):
+    """single-day answer -> dict, None if not JSON or the schema was echoed back"""
+    j = _json_object(text)
+    if j is None or j.get("daily_schedule_and_impact") == REPORT_HINT:
+        return None
+    return j
+
+@instrumented("ai_day")
+def _generate_from_ctx(ctx):
+    system, prompt = prompt_builder().day(ctx)
+    j = _parse_ai_day(call_gemini_json(prompt, system=system, accept=lambda t: _parse_ai_day(t) is not None))
+    if j is None:
+        return None
+
+    return finalize_ai_day(_drop_placeholders(j), ctx)
+
+def _is_valid_batch_day(obj) -> bool:
+    if not isinstance(obj, dict):
+        return False
+    body = obj.get("daily_schedule_and_impact")
+    return isinstance(body, str) and bool(body.strip()) and body != REPORT_HINT
+
+def _parse_batch(text, ctxs):
+    """batch answer -> {date_str: day object} of the valid days (empty if unusable)"""
+    try:
+        j = json.loads(extract_json_block(text or ""))
+    except Exception:
+        return {}
+    days = j.get("days") if isinstance(j, dict) else j
+    if not isinstance(days, list):
+        return {}
+
+    by_key = {}
+    for obj in days:
+        if isinstance(obj, dict) and isinstance(obj.get("date_key"), str):
+            by_key.setdefault(obj["date_key"].strip(), obj)
+    # no date_key at all -> trust order if the count matches
+    if not by_key and len(days) == len(ctxs):
+        by_key = {ctx["date_str"]: obj for ctx, obj in zip(ctxs, days)}
+
+    return {ctx["date_str"]: by_key[ctx["date_str"]] for ctx in ctxs if _is_valid_batch_day(by_key.get(ctx["date_str"]))}
+
+@instrumented("ai_days_batch")
+def _generate_batch(area_data, ctxs):
+    """one Gemini call for ctxs -> {date_str: finalized day} (missing/invalid days absent)"""
+    system, prompt = prompt_builder().days(area_data, ctxs)
+    # cached only when every day is usable: a partial batch is asked again on the re-run
+    res = call_gemini_json(prompt, system=system, accept=lambda t: len(_parse_batch(t, ctxs)) == len(ctxs))
+    days = _parse_batch(res, ctxs)
+
+    out = {}
+    for ctx in ctxs:
+        obj = days.get(ctx["date_str"])
+        if obj is None:
+            continue
+        obj.pop("date_key", None)
+        day = finalize_ai_day(_drop_placeholders(obj), ctx)
+        if day:
+            out[ctx["date_str"]] = day
+    return out
+
 # =========================
-# Area processing
+# Incremental state (fingerprints of facts_block per area/day)
 # =========================
-def process_single_area(item):
-    area_key, area_data = item
-    print(f"\n📍 {area_data['name']} 開始", flush=True)
+_state_lock = threading.Lock()
+_prev_state = {}  # area_key -> {date_key: {"fp":..., "out":...}} (previous run)
+_next_state = {}  # same shape, only days generated/reused in this run
+
+def facts_fingerprint(ctx) -> str:
+    # prompt template & model are part of the input: editing them invalidates every day
+    raw = "\n".join([GEMINI_MODEL, prompt_builder().version, ctx["facts_block"]])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def load_ai_state():
+    global _prev_state, _next_state
+    _prev_state, _next_state = {}, {}
+    if not INCREMENTAL:
+        return
+    try:
+        with open(STATE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict) and isinstance(data.get("areas"), dict):
+            _prev_state = data["areas"]
+    except Exception:
+        pass
 
-    daily_db, warning_text = get_jma_forecast_data(area_data["jma_code"])
-    om = fetch_openmeteo_hourly(area_data["lat"], area_data["lon"], days=AI_DAYS)
-    facts_by_date = fetch_event_traffic_7days(area_data["name"], AI_DAYS)
-    long_term_text = get_long_term_text_safe(area_data["name"])
+def reuse_ai_day(area_key: str, ctx):
+    """previous output if fingerprint matches, else None"""
+    if not INCREMENTAL:
+        return None
+    prev = (_prev_state.get(area_key) or {}).get(ctx["date_str"])
+    if not isinstance(prev, dict) or prev.get("fp") != ctx["fingerprint"]:
+        return None
+    out = prev.get("out")
+    return copy.deepcopy(out) if isinstance(out, dict) else None
+
+def record_ai_day(area_key: str, ctx, out):
+    if not INCREMENTAL or not out:
+        return
+    with _state_lock:
+        _next_state.setdefault(area_key, {})[ctx["date_str"]] = {"fp": ctx["fingerprint"], "out": copy.deepcopy(out)}
+
+def save_ai_state():
+    if not INCREMENTAL:
+        return
+    with _state_lock:
+        data = {"version": 1, "model": GEMINI_MODEL, "areas": _next_state}
+    tmp = STATE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp, STATE_PATH)
+
+def restore_ai_days(area_key: str, days):
+    """carry a checkpointed area's days ({date_key: {"fp","out"}}) into the next state"""
+    if not INCREMENTAL or not days:
+        return
+    with _state_lock:
+        _next_state.setdefault(area_key, {}).update(copy.deepcopy(days))
 
-    area_forecasts = []
-    today_dt = datetime.now(JST)
+# =========================
+# Checkpoint (resume an interrupted run of the same day)
+# =========================
+class CheckpointStore:
+    """
+    CACHE_DIR/<name>/<run_date>/<area_key>.json (name: "checkpoint", per shard "checkpoint-shard-i-of-N")
+      {"events": {date_key: text}, "long_term_text": str, "days": {date_key: {"fp","out"}}}
+    Always written while the run progresses; only read back with --resume.
+    Only successful results are recorded (fallbacks are retried on resume).
+    """
+    def __init__(self, run_date: str, resume: bool = False, name: str = "checkpoint"):
+        root = os.path.join(CACHE_DIR, name)
+        self.dir = os.path.join(root, run_date)
+        self.resume = resume
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._data = {}
+        os.makedirs(self.dir, exist_ok=True)
+        for name in os.listdir(root):
+            if name != run_date:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    def _path(self, area_key: str) -> str:
+        return os.path.join(self.dir, f"{area_key}.json")
+
+    def _area(self, area_key: str):
+        # caller holds the lock
+        if area_key not in self._data:
+            data = _load_json(self._path(area_key), {}) if self.resume else {}
+            self._data[area_key] = data if isinstance(data, dict) else {}
+        return self._data[area_key]
+
+    def _flush(self, area_key: str):
+        raw = json.dumps(self._data[area_key], ensure_ascii=False, separators=(",", ":"))
+        _write_atomic(self._path(area_key), raw.encode("utf-8"))
+
+    def get(self, area_key: str, field: str):
+        """checkpointed value (None if absent or not resuming)"""
+        if not self.resume:
+            return None
+        with self._lock:
+            value = self._area(area_key).get(field)
+        if value:
+            self.hits += 1
+        return copy.deepcopy(value) if value else None
+
+    def put(self, area_key: str, field: str, value):
+        with self._lock:
+            self._area(area_key)[field] = copy.deepcopy(value)
+            self._flush(area_key)
+
+    def put_day(self, area_key: str, ctx, out):
+        if not out:
+            return
+        with self._lock:
+            days = self._area(area_key).setdefault("days", {})
+            days[ctx["date_str"]] = {"fp": ctx.get("fingerprint"), "out": copy.deepcopy(out)}
+            self._flush(area_key)
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+CHECKPOINTS = None  # CheckpointStore of the current run (set in main)
 
+# =========================
+# Area processing
+# =========================
+def build_day_contexts(area_key, area_data, daily_db, warning_text: str, om, facts_by_date, today_dt: datetime):
+    """AI_DAYS day contexts (facts + fingerprint). No I/O: AMeDAS comes from the prefetched table."""
+    ctxs = []
+    for i in range(min(AI_DAYS, RUN_DAYS)):
+        target_dt = today_dt + timedelta(days=i)
+        date_key = target_dt.strftime("%Y-%m-%d")
+        ctx = prepare_ai_day(
+            area_data=area_data,
+            target_dt=target_dt,
+            jma_day_data=daily_db.get(date_key, {}),
+            warning_text=warning_text,
+            slot_weather=build_slot_weather(om, target_dt),
+            event_traffic_text=(facts_by_date.get(date_key) or "").strip()
+        )
+        ctx["fingerprint"] = facts_fingerprint(ctx)
+        ctx["day_offset"] = i
+        ctxs.append(ctx)
+    return ctxs
+
+def assemble_area_forecasts(area_data, today_dt: datetime, ai_by_date, reused, long_term_text: str):
+    area_forecasts = []
     for i in range(RUN_DAYS):
         target_dt = today_dt + timedelta(days=i)
         date_key = target_dt.strftime("%Y-%m-%d")
 
         if i < AI_DAYS:
-            day_data = daily_db.get(date_key, {})
-            slot_weather = build_slot_weather(om, target_dt)
-            et_text = (facts_by_date.get(date_key) or "").strip()
-
-            print(f"🤖 {area_data['name']} / {date_key} ", end="", flush=True)
-            ai = generate_ai_day(
-                area_data=area_data,
-                target_dt=target_dt,
-                jma_day_data=day_data,
-                warning_text=warning_text,
-                slot_weather=slot_weather,
-                event_traffic_text=et_text
-            )
+            ai = ai_by_date.get(date_key)
             if ai:
-                print("OK", flush=True)
+                ai["date_key"] = date_key
+            if ai and date_key in reused:
+                print(f"🤖 {area_data['name']} / {date_key} ♻️ 再利用", flush=True)
+                area_forecasts.append(ai)
+            elif ai:
+                print(f"🤖 {area_data['name']} / {date_key} OK", flush=True)
                 area_forecasts.append(ai)
             else:
-                print("NG → fallback", flush=True)
+                print(f"🤖 {area_data['name']} / {date_key} NG → fallback", flush=True)
+                metric_add("fallbacks")
                 area_forecasts.append(build_long_term_day(target_dt, long_term_text))
         else:
             area_forecasts.append(build_long_term_day(target_dt, long_term_text))
+    return area_forecasts
+
+async def process_single_area(item):
+    area_key, area_data = item
+    _metric_area.set(area_key)  # task-local: every stage below is attributed to this area
+    print(f"\n📍 {area_data['name']} 開始", flush=True)
 
+    # --resume: event facts / long-term text already fetched today are not asked again
+    cp_events = CHECKPOINTS.get(area_key, "events")
+    cp_long_term = CHECKPOINTS.get(area_key, "long_term_text")
+    cp_days = CHECKPOINTS.get(area_key, "days") or {}
+
+    async def _checkpointed(value):
+        return value
+
+    # independent upstream stages overlap
+    (daily_db, warning_text), om_raw, facts_by_date, long_term_text = await asyncio.gather(
+        get_jma_forecast_data_async(area_data["jma_code"]),
+        run_io("openmeteo", get_openmeteo_hourly, area_data["lat"], area_data["lon"], AI_DAYS),
+        _checkpointed(cp_events) if cp_events else get_event_traffic_async(area_key, area_data, AI_DAYS),
+        _checkpointed(cp_long_term) if cp_long_term else run_io("gemini", get_long_term_text_safe, area_data["name"]),
+    )
+    om = index_openmeteo_hourly(om_raw)
+    if not cp_events and any((v or "").strip() for v in facts_by_date.values()):
+        CHECKPOINTS.put(area_key, "events", facts_by_date)
+    if not cp_long_term and long_term_text != long_term_base_text(area_data["name"]):
+        CHECKPOINTS.put(area_key, "long_term_text", long_term_text)
+
+    today_dt = datetime.now(JST)
+    ctxs = build_day_contexts(area_key, area_data, daily_db, warning_text, om, facts_by_date, today_dt)
+
+    # unchanged facts -> previous output, only changed days go to Gemini
+    ai_by_date = {}
+    reused = set()
+    pending = []
+    for ctx in ctxs:
+        cp_day = cp_days.get(ctx["date_str"]) or {}
+        if cp_day.get("out") and cp_day.get("fp") == ctx["fingerprint"]:
+            # completed earlier today (interrupted run) from the same facts; changed facts -> generated again
+            ai_by_date[ctx["date_str"]] = cp_day["out"]
+            record_ai_day(area_key, ctx, cp_day["out"])
+            continue
+        prev = reuse_ai_day(area_key, ctx)
+        if prev is None:
+            pending.append(ctx)
+            continue
+        ai_by_date[ctx["date_str"]] = prev
+        reused.add(ctx["date_str"])
+        record_ai_day(area_key, ctx, prev)
+        CHECKPOINTS.put_day(area_key, ctx, prev)
+
+    for ctx, ai in zip(pending, await SCHEDULER.submit(area_key, area_data, pending)):
+        ai_by_date[ctx["date_str"]] = ai
+        record_ai_day(area_key, ctx, ai)
+        CHECKPOINTS.put_day(area_key, ctx, ai)
+
+    area_forecasts = assemble_area_forecasts(area_data, today_dt, ai_by_date, reused, long_term_text)
+    inputs = {ctx["date_str"]: {"fingerprint": ctx["fingerprint"], "facts": ctx["facts_block"]} for ctx in ctxs}
     print(f"✅ {area_data['name']} 完了", flush=True)
-    return area_key, area_forecasts
+    return area_key, area_forecasts, long_term_text, inputs
+
+# =========================
+# Async engine
+# =========================
+_upstream_sems = {}
+
+async def run_io(upstream: str, fn, *args):
+    """
+    Every external call goes through here as a coroutine:
+    blocking fetch runs on the shared I/O pool, gated by the upstream's concurrency limit.
+    """
+    ctx = contextvars.copy_context()  # keep metric attribution inside the worker thread
+    async with _upstream_sems[upstream]:
+        return await asyncio.get_running_loop().run_in_executor(None, ctx.run, functools.partial(fn, *args))
+
+async def get_jma_forecast_data_async(area_code: str):
+    daily_db, warning_text = await asyncio.gather(
+        run_io("jma", get_jma_daily_db, area_code),
+        run_io("jma", get_jma_warning_text, area_code),
+    )
+    return daily_db, warning_text
+
+_event_groups = {}        # area_key -> member areas of its search region (set per run in run_all_areas)
+_event_region_tasks = {}  # (member keys, days) -> shared task: one search per region, awaited by every member
+
+async def get_event_traffic_async(area_key: str, area_data, days: int):
+    """facts_by_date for one area: the shared regional search, or the per-area search for a lone area"""
+    members = _event_groups.get(area_key)
+    if not members or len(members) < 2:
+        return await run_io("gemini", fetch_event_traffic_7days, area_data["name"], days)
+    key = (tuple(members), days)
+    task = _event_region_tasks.get(key)
+    if task is None:
+        task = _event_region_tasks[key] = asyncio.ensure_future(run_io("gemini", fetch_region_event_traffic, members, days))
+    region = await task
+    return dict(region[area_key])
+
+async def generate_ai_days_async(area_data, ctxs):
+    """
+    Batched generation: AI_BATCH_DAYS days per Gemini call (chunks run concurrently).
+    Days missing/invalid in the batch response are retried one by one.
+    Returns list aligned with ctxs (None = caller falls back).
+    """
+    if not API_KEY or not ctxs:
+        return [None] * len(ctxs)
+
+    chunks = []
+    if AI_BATCH_DAYS > 1 and len(ctxs) > 1:
+        chunks = [ctxs[i:i + AI_BATCH_DAYS] for i in range(0, len(ctxs), AI_BATCH_DAYS)]
+        chunks = [c for c in chunks if len(c) > 1]
+
+    results = {}
+    for part in await asyncio.gather(*[run_io("gemini", _generate_batch, area_data, c) for c in chunks]):
+        results.update(part)
+
+    missing = [ctx for ctx in ctxs if ctx["date_str"] not in results]
+    retried = await asyncio.gather(*[run_io("gemini", _generate_from_ctx, ctx) for ctx in missing])
+    for ctx, day in zip(missing, retried):
+        results[ctx["date_str"]] = day
+
+    return [results.get(ctx["date_str"]) for ctx in ctxs]
+
+class AiScheduler:
+    """
+    One priority queue of AI units (area, day-chunk) for the whole run.
+    - order: day offset -> AREA_WEIGHTS (desc) -> TARGET_AREAS order
+      (the first PRIORITY_NEAR_DAYS days of every area are one unit, the rest AI_BATCH_DAYS-day units)
+    - workers dispatch as soon as units are queued (a slow area's upstream latency delays nobody);
+      priority only orders the units that are ready, so queued near days still go before far ones
+    - past DEADLINE_SECONDS no new unit starts: its days resolve to None (long-term fallback)
+    """
+    def __init__(self, area_keys, deadline_at=None):
+        self.order = {k: i for i, k in enumerate(area_keys)}
+        self.deadline_at = deadline_at
+        self.queue = asyncio.PriorityQueue()
+        self.seq = 0
+        self.units = self.skipped_units = self.skipped_days = 0
+
+    def _chunks(self, ctxs):
+        near = [c for c in ctxs if c["day_offset"] < PRIORITY_NEAR_DAYS]
+        rest = [c for c in ctxs if c["day_offset"] >= PRIORITY_NEAR_DAYS]
+        size = max(1, AI_BATCH_DAYS)
+        return ([near] if near else []) + [rest[i:i + size] for i in range(0, len(rest), size)]
+
+    async def submit(self, area_key: str, area_data, ctxs):
+        """queue this area's days; returns results aligned with ctxs (None = fallback)"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for chunk in self._chunks(ctxs) if API_KEY else []:
+            fut = loop.create_future()
+            prio = (chunk[0]["day_offset"], -AREA_WEIGHTS.get(area_key, 1), self.order.get(area_key, len(self.order)), self.seq)
+            self.seq += 1
+            self.queue.put_nowait((prio, area_key, area_data, chunk, fut))
+            futures.append((chunk, fut))
+
+        results = {}
+        for chunk, fut in futures:
+            for ctx, ai in zip(chunk, await fut):
+                results[ctx["date_str"]] = ai
+        return [results.get(ctx["date_str"]) for ctx in ctxs]
+
+    async def worker(self):
+        while True:
+            _, area_key, area_data, chunk, fut = await self.queue.get()
+            try:
+                if self.deadline_at is not None and time.monotonic() >= self.deadline_at:
+                    if not self.skipped_units:
+                        print(f"⏱️ deadline ({DEADLINE_SECONDS:.0f}s): 残りのAI生成は fallback", flush=True)
+                    self.skipped_units += 1
+                    self.skipped_days += len(chunk)
+                    fut.set_result([None] * len(chunk))
+                    continue
+                self.units += 1
+                _metric_area.set(area_key)  # the worker task runs every area's units: attribute this one
+                fut.set_result(await generate_ai_days_async(area_data, chunk))
+            except Exception as e:
+                print(f"AI unit Err: {e}", flush=True)
+                if not fut.done():
+                    fut.set_result([None] * len(chunk))
+            finally:
+                self.queue.task_done()
+
+SCHEDULER = None  # AiScheduler of the current run (set in run_all_areas)
+
+def _init_engine():
+    """shared I/O pool + per-upstream semaphores for the running event loop"""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=MAX_WORKERS))
+    _upstream_sems.clear()
+    for name, limit in UPSTREAM_CONCURRENCY.items():
+        _upstream_sems[name] = asyncio.Semaphore(max(1, limit))
+
+async def run_all_areas(areas: dict, writer):
+    global SCHEDULER
+    deadline_at = time.monotonic() + DEADLINE_SECONDS if DEADLINE_SECONDS > 0 else None
+    _init_engine()
+
+    done = []
+    todo = {}
+    for key, area_data in areas.items():
+        if CHECKPOINTS.resume and writer.has(key):
+            # finished before the interruption: partial output is kept as is
+            print(f"⏭️ {area_data['name']} 完了済み (resume)", flush=True)
+            restore_ai_days(key, CHECKPOINTS.get(key, "days"))
+            done.append(key)
+            continue
+        todo[key] = area_data
+
+    if AI_DAYS > 0 and todo:
+        await asyncio.gather(
+            run_io("openmeteo", prefetch_openmeteo_hourly, todo, AI_DAYS),
+            prefetch_amedas_stats(todo),
+        )
+    _event_groups.clear()
+    _event_groups.update(event_region_groups(areas))
+    _event_region_tasks.clear()
+
+    SCHEDULER = AiScheduler(list(todo), deadline_at)
+    workers = [asyncio.ensure_future(SCHEDULER.worker()) for _ in range(max(1, UPSTREAM_CONCURRENCY["gemini"]))]
+
+    tasks = [asyncio.ensure_future(process_single_area(item)) for item in todo.items()]
+    for fut in asyncio.as_completed(tasks):
+        try:
+            key, data, long_term_text, inputs = await fut
+            writer.add(key, data, long_term_text, inputs)  # persisted now, not held until the end
+            done.append(key)
+        except Exception as e:
+            print(f"Err: {e}", flush=True)
+    for w in workers:
+        w.cancel()
+    return done
+
+# =========================
+# Weather-only refresh (numbers only, AI text kept)
+# =========================
+_LONG_TERM_TEXT_RE = re.compile(r"■長期傾向\n(.*)\n\Z", re.S)
+
+def load_existing_output():
+    """current output (full or compact) -> {area_key: (forecasts, long_term_text)}, None if missing"""
+    doc = _load_json(OUTPUT_PATH)
+    if not isinstance(doc, dict):
+        return None
+    if doc.get("schema_version") == COMPACT_SCHEMA_VERSION:
+        return {k: (expand_area(a), a.get("long_term_text") or "") for k, a in (doc.get("areas") or {}).items()}
+    out = {}
+    for key, forecasts in doc.items():
+        text = ""
+        for day in forecasts:
+            m = day.get("is_long_term") and _LONG_TERM_TEXT_RE.search(day.get("daily_schedule_and_impact") or "")
+            if m:
+                text = m.group(1)
+                break
+        out[key] = (forecasts, text)
+    return out
+
+def refresh_day_weather(day, ctx):
+    """overwrite weather_overview and timeline slot weather with fresh values; advice & texts untouched"""
+    wo = day.get("weather_overview") if isinstance(day.get("weather_overview"), dict) else {}
+    wo.update(ctx["overview"])
+    day["weather_overview"] = wo
+    for slot_name in SLOT_NAMES:
+        slot = day["timeline"].get(slot_name)
+        if not isinstance(slot, dict):
+            continue
+        base = ctx["slot_weather"].get(slot_name, {})
+        slot["weather"] = str(base.get("weather") or "☁️")
+        for k in ["temp", "temp_high", "temp_low", "humidity", "rain"]:
+            slot[k] = str(base.get(k) or "-")
+    return day
+
+def refresh_area_weather(area_data, forecasts, daily_db, warning_text: str, om, today_dt: datetime):
+    """AI days of the current forecast window get fresh weather (AMeDAS from the prefetched table)"""
+    window = {}
+    for i in range(min(AI_DAYS, RUN_DAYS)):
+        target_dt = today_dt + timedelta(days=i)
+        window[target_dt.strftime("%Y-%m-%d")] = target_dt
+    by_label = {_date_label(dt): dk for dk, dt in window.items()}  # files written before date_key existed
+
+    refreshed = 0
+    for day in forecasts:
+        if day.get("is_long_term") or not isinstance(day.get("timeline"), dict):
+            continue
+        dk = day.get("date_key") or by_label.get(day.get("date"))
+        if dk not in window:
+            continue
+        ctx = prepare_ai_day(
+            area_data=area_data,
+            target_dt=window[dk],
+            jma_day_data=daily_db.get(dk, {}),
+            warning_text=warning_text,
+            slot_weather=build_slot_weather(om, window[dk]),
+            event_traffic_text=""
+        )
+        refresh_day_weather(day, ctx)
+        refreshed += 1
+    return refreshed
+
+async def refresh_all_weather(existing, writer):
+    _init_engine()
+    areas = {k: a for k, a in TARGET_AREAS.items() if k in existing}
+    if AI_DAYS > 0 and areas:
+        await asyncio.gather(
+            run_io("openmeteo", prefetch_openmeteo_hourly, areas, AI_DAYS),
+            prefetch_amedas_stats(areas),
+        )
+    today_dt = datetime.now(JST)
+
+    async def one(key, area_data):
+        _metric_area.set(key)
+        forecasts, long_term_text = existing[key]
+        (daily_db, warning_text), om_raw = await asyncio.gather(
+            get_jma_forecast_data_async(area_data["jma_code"]),
+            run_io("openmeteo", get_openmeteo_hourly, area_data["lat"], area_data["lon"], AI_DAYS),
+        )
+        om = index_openmeteo_hourly(om_raw)
+        n = refresh_area_weather(area_data, forecasts, daily_db, warning_text, om, today_dt)
+        print(f"🌦️ {area_data['name']} {n}日分 更新", flush=True)
+
+    results = await asyncio.gather(*[one(k, a) for k, a in areas.items()], return_exceptions=True)
+    for (key, _), res in zip(areas.items(), results):
+        if isinstance(res, Exception):
+            print(f"Err: {key}: {res}", flush=True)  # previous numbers are kept
+
+    # every area of the existing file is written back (refreshed or not)
+    for key, (forecasts, long_term_text) in existing.items():
+        writer.add(key, forecasts, long_term_text)
+
+# =========================
+# Output (full / compact schema v2)
+# =========================
+def _date_from_key(date_key: str) -> datetime:
+    return datetime.strptime(date_key, "%Y-%m-%d").replace(tzinfo=JST)
+
+def compact_area(forecasts, long_term_text: str):
+    """
+    full day list -> {"long_term_text", "days": [full objects], "long_term": [[date_key, rank], ...]}
+    A day becomes a (date, rank) record only if it is exactly what build_long_term_day would produce.
+    """
+    days = []
+    long_term = []
+    for day in forecasts:
+        dk = day.get("date_key")
+        if dk and day.get("is_long_term"):
+            expected = build_long_term_day(_date_from_key(dk), long_term_text)
+            expected["rank"] = day.get("rank")
+            if day == expected:
+                long_term.append([dk, day["rank"]])
+                continue
+        days.append(day)
+    return {"long_term_text": long_term_text, "days": days, "long_term": long_term}
+
+def expand_area(area):
+    """compact area -> full day list (date order), inverse of compact_area"""
+    text = area.get("long_term_text") or ""
+    out = list(area.get("days") or [])
+    for dk, rank in area.get("long_term") or []:
+        day = build_long_term_day(_date_from_key(dk), text)
+        day["rank"] = rank
+        out.append(day)
+    out.sort(key=lambda d: d.get("date_key") or "")
+    return out
+
+def expand_document(doc):
+    """compact (v2) or full document -> full {area_key: [day, ...]}"""
+    if isinstance(doc, dict) and doc.get("schema_version") == COMPACT_SCHEMA_VERSION:
+        return {key: expand_area(area) for key, area in doc.get("areas", {}).items()}
+    return doc
+
+def _write_atomic(path: str, raw: bytes):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(raw)
+    os.replace(tmp, path)
+
+def _load_json(path: str, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return default
+
+class ShardWriter:
+    """
+    SHARD_DIR/<area_key>.json (compact v2 area, minified) + SHARD_DIR/index.json.
+    Unchanged shards (same sha256) are not rewritten and keep their previous generated_at,
+    so clients and git only see areas whose content actually changed.
+    """
+    def __init__(self):
+        os.makedirs(SHARD_DIR, exist_ok=True)
+        self.manifest_path = os.path.join(SHARD_DIR, "index.json")
+        self.prev = (_load_json(self.manifest_path, {}) or {}).get("areas", {})
+        self.now = datetime.now(JST).isoformat(timespec="seconds")
+        self.areas = {}
+        self.changed = 0
+
+    def add(self, key: str, forecasts, long_term_text: str):
+        shard = {"schema_version": COMPACT_SCHEMA_VERSION, "area_key": key, **compact_area(forecasts, long_term_text)}
+        raw = json.dumps(shard, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        name = f"{key}.json"
+        path = os.path.join(SHARD_DIR, name)
+
+        old = self.prev.get(key) or {}
+        if old.get("sha256") == digest and os.path.exists(path):
+            generated_at = old.get("generated_at") or self.now
+        else:
+            _write_atomic(path, raw)
+            generated_at = self.now
+            self.changed += 1
+        self.areas[key] = {
+            "name": (TARGET_AREAS.get(key) or {}).get("name", key),
+            "file": name,
+            "sha256": digest,
+            "bytes": len(raw),
+            "generated_at": generated_at,
+        }
+
+    def finish(self):
+        # areas dropped from TARGET_AREAS
+        for key, old in self.prev.items():
+            if key not in self.areas:
+                try:
+                    os.remove(os.path.join(SHARD_DIR, old.get("file") or f"{key}.json"))
+                except OSError:
+                    pass
+
+        manifest = {
+            "schema_version": COMPACT_SCHEMA_VERSION,
+            "generated_at": self.now,
+            "job_keys": JOB_KEYS,
+            "areas": self.areas,
+        }
+        _write_atomic(self.manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+        print(f"🗂️ shards: {self.changed}/{len(self.areas)} 更新", flush=True)
+        return self.manifest_path
+
+def content_hash(obj, n=32) -> str:
+    """sha256 of canonical JSON (sorted keys, no whitespace)"""
+    raw = json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:n]
+
+def document_hash(area_hashes: dict) -> str:
+    """document identity from per-area hashes (area order does not matter)"""
+    raw = "\n".join(f"{k}:{area_hashes[k]}" for k in sorted(area_hashes))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+def _is_plain_long_term(day, long_term_text: str) -> bool:
+    if not day.get("is_long_term") or not day.get("date_key"):
+        return False
+    expected = build_long_term_day(_date_from_key(day["date_key"]), long_term_text)
+    expected["rank"] = day.get("rank")
+    return day == expected
+
+def area_delta(prev_days, days, long_term_text: str):
+    """
+    ops turning prev_days into days, keyed by date_key:
+      {"op": "put", "date", "day", "h"}  replace/insert a day
+      {"op": "lt", "date", "rank", "h"}  plain long-term day (rebuilt from long_term_text)
+      {"op": "del", "date"}              day no longer present
+    h = content_hash of the new day (16 hex)
+    """
+    prev = {d.get("date_key"): content_hash(d, 16) for d in prev_days}
+    ops = []
+    for day in days:
+        dk = day.get("date_key")
+        h = content_hash(day, 16)
+        if prev.pop(dk, None) == h:
+            continue
+        if _is_plain_long_term(day, long_term_text):
+            ops.append({"op": "lt", "date": dk, "rank": day.get("rank"), "h": h})
+        else:
+            ops.append({"op": "put", "date": dk, "day": day, "h": h})
+    ops.extend({"op": "del", "date": dk} for dk in sorted(prev))
+    entry = {"ops": ops}
+    if any(op["op"] == "lt" for op in ops):
+        entry["long_term_text"] = long_term_text
+    return entry
+
+def apply_delta(doc, delta):
+    """
+    full {area_key: [day, ...]} at delta["from"] -> full document at delta["to"].
+    Raises ValueError if doc is not the delta's base or the result does not hash to "to".
+    """
+    if document_hash({k: content_hash(v) for k, v in doc.items()}) != delta.get("from"):
+        raise ValueError("delta base mismatch")
+    out = {}
+    for key in delta.get("order") or list(doc):
+        entry = (delta.get("areas") or {}).get(key)
+        if entry is None:
+            out[key] = doc[key]
+            continue
+        by_date = {d.get("date_key"): d for d in doc.get(key) or []}
+        for op in entry.get("ops") or []:
+            if op["op"] == "del":
+                by_date.pop(op["date"], None)
+            elif op["op"] == "lt":
+                day = build_long_term_day(_date_from_key(op["date"]), entry.get("long_term_text") or "")
+                day["rank"] = op.get("rank")
+                by_date[op["date"]] = day
+            else:
+                by_date[op["date"]] = op["day"]
+        out[key] = [by_date[dk] for dk in sorted(by_date)]
+    if document_hash({k: content_hash(v) for k, v in out.items()}) != delta.get("to"):
+        raise ValueError("delta result mismatch")
+    return out
+
+class DeltaWriter:
+    """
+    DELTA_DIR/<from hash>.json: what changed between the previous output (from) and this one (to),
+    DELTA_DIR/index.json: latest hash + the newest DELTA_KEEP deltas (older files removed).
+    A client holding document <h> fetches <h>.json and repeats until it reaches "latest".
+    The base is the previous run's per-area shards (OUTPUT_SHARDS), read one area at a time;
+    it is used only if those shards hash to the previous "latest" (otherwise no delta this run).
+    add()/finish() must run before ShardWriter overwrites / removes the shard files.
+    """
+    def __init__(self):
+        os.makedirs(DELTA_DIR, exist_ok=True)
+        self.index_path = os.path.join(DELTA_DIR, "index.json")
+        self.index = _load_json(self.index_path, {}) or {}
+        self.prev_keys = set(((_load_json(os.path.join(SHARD_DIR, "index.json"), {}) or {}).get("areas") or {}))
+        self.prev_hashes = {}
+        self.hashes = {}
+        self.order = []
+        self.areas = {}
+        self.usable = bool(self.prev_keys) and bool(self.index.get("latest"))
+
+    def _prev_days(self, key: str):
+        shard = _load_json(os.path.join(SHARD_DIR, f"{key}.json"))
+        if not isinstance(shard, dict):
+            self.usable = False
+            return []
+        days = expand_area(shard)
+        if not all(d.get("date_key") for d in days):
+            self.usable = False  # ops are keyed by date_key
+        self.prev_hashes[key] = content_hash(days)
+        return days
+
+    def add(self, key: str, forecasts, long_term_text: str):
+        self.order.append(key)
+        self.hashes[key] = content_hash(forecasts)
+        prev_days = []
+        if key in self.prev_keys:
+            self.prev_keys.discard(key)
+            prev_days = self._prev_days(key)
+            if self.prev_hashes.get(key) == self.hashes[key]:
+                return
+        self.areas[key] = area_delta(prev_days, forecasts, long_term_text)
+
+    def finish(self):
+        removed = sorted(self.prev_keys)  # areas no longer in the output
+        for key in removed:
+            self._prev_days(key)
+        now = datetime.now(JST).isoformat(timespec="seconds")
+        to_hash = document_hash(self.hashes)
+        entries = self.index.get("deltas") or []
+
+        from_hash = document_hash(self.prev_hashes) if self.usable else None
+        if from_hash is None or from_hash != self.index.get("latest"):
+            if self.index.get("latest"):
+                # shards missing / out of sync with the previous document: no trustworthy base
+                print("🧩 delta: 前回シャードが前回出力と一致しないためスキップ", flush=True)
+        elif from_hash != to_hash:
+            delta = {
+                "schema_version": DELTA_SCHEMA_VERSION,
+                "from": from_hash,
+                "to": to_hash,
+                "generated_at": now,
+                "order": self.order,
+                "removed_areas": removed,
+                "areas": self.areas,  # changed/new areas only; removed ones are absent from "order"
+            }
+            raw = json.dumps(delta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            name = f"{from_hash}.json"
+            _write_atomic(os.path.join(DELTA_DIR, name), raw)
+            entries = [e for e in entries if e.get("from") != from_hash]
+            entries.insert(0, {"from": from_hash, "to": to_hash, "file": name, "bytes": len(raw), "generated_at": now})
+            print(f"🧩 delta: {len(delta['areas'])} エリア変更 / {len(raw) // 1024}KB", flush=True)
+
+        entries = entries[:max(0, DELTA_KEEP)]
+        keep = {e["file"] for e in entries} | {"index.json"}
+        for name in os.listdir(DELTA_DIR):
+            if name.endswith(".json") and name not in keep:
+                try:
+                    os.remove(os.path.join(DELTA_DIR, name))
+                except OSError:
+                    pass
+        manifest = {"schema_version": DELTA_SCHEMA_VERSION, "latest": to_hash, "generated_at": now, "deltas": entries}
+        _write_atomic(self.index_path, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+        return self.index_path
+
+class OutputWriter:
+    """
+    Streaming, atomic writer.
+    - add(): each finished area is persisted right away to CACHE_DIR/partial/<run_date>/<area_key>.json
+      (nothing is held in memory, an interrupted run keeps its progress)
+    - finalize(): streams the partials one area at a time into temp files, then os.replace()
+      -> readers only ever see the previous complete file or the new complete file
+    OUTPUT_FORMAT: full (compatibility writer) / compact / both; OUTPUT_SHARDS=1 adds per-area shards.
+    Partials of the same run date left by an earlier interrupted run are included.
+    """
+    def __init__(self, run_date: str, partial_name: str = "partial"):
+        root = os.path.join(CACHE_DIR, partial_name)
+        self.dir = os.path.join(root, run_date)
+        os.makedirs(self.dir, exist_ok=True)
+        # older run dates are never resumed
+        for name in os.listdir(root):
+            if name != run_date:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.dir, f"{key}.json")
+
+    def add(self, key: str, forecasts, long_term_text: str, inputs=None):
+        """inputs: {date_key: {...}} behind the AI days (kept for the archive)"""
+        data = {"forecasts": forecasts, "long_term_text": long_term_text, "inputs": inputs or {}}
+        raw = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        _write_atomic(self._path(key), raw.encode("utf-8"))
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def keys(self):
+        done = {n[:-5] for n in os.listdir(self.dir) if n.endswith(".json")}
+        return [k for k in TARGET_AREAS if k in done] + sorted(done - set(TARGET_AREAS))
+
+    def load(self, key: str):
+        data = _load_json(self._path(key), {}) or {}
+        return data.get("forecasts") or [], data.get("long_term_text") or ""
+
+    def inputs(self, key: str):
+        return (_load_json(self._path(key), {}) or {}).get("inputs") or {}
+
+    def finalize(self):
+        keys = self.keys()
+        targets = []  # (final path, temp path, file)
+        full = compact = None
+        if OUTPUT_FORMAT in ("full", "both"):
+            full = open(OUTPUT_PATH + ".tmp", "w", encoding="utf-8")
+            targets.append((OUTPUT_PATH, full))
+            full.write("{" if keys else "{}")
+        if OUTPUT_FORMAT in ("compact", "both"):
+            path = OUTPUT_PATH if OUTPUT_FORMAT == "compact" else COMPACT_OUTPUT_PATH
+            compact = open(path + ".tmp", "w", encoding="utf-8")
+            targets.append((path, compact))
+            head = {"schema_version": COMPACT_SCHEMA_VERSION, "generated_at": datetime.now(JST).isoformat(timespec="seconds"), "job_keys": JOB_KEYS}
+            compact.write(json.dumps(head, ensure_ascii=False, separators=(",", ":"))[:-1] + ',"areas":{')
+        shards = ShardWriter() if OUTPUT_SHARDS else None
+        deltas = DeltaWriter() if OUTPUT_DELTAS and OUTPUT_SHARDS else None  # diffs against the previous shards
+
+        try:
+            for n, key in enumerate(keys):
+                forecasts, long_term_text = self.load(key)
+                key_json = json.dumps(key, ensure_ascii=False)
+                if full:
+                    # same layout as json.dump(master_data, indent=2), one area at a time
+                    body = json.dumps(forecasts, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+                    full.write(("," if n else "") + f"\n  {key_json}: {body}")
+                if compact:
+                    body = json.dumps(compact_area(forecasts, long_term_text), ensure_ascii=False, separators=(",", ":"))
+                    compact.write(("," if n else "") + f"{key_json}:{body}")
+                if deltas:
+                    deltas.add(key, forecasts, long_term_text)  # before the shard file is replaced
+                if shards:
+                    shards.add(key, forecasts, long_term_text)
+            if full and keys:
+                full.write("\n}")
+            if compact:
+                compact.write("}}")
+        finally:
+            for _, f in targets:
+                f.close()
+
+        written = []
+        for path, f in targets:
+            os.replace(f.name, path)
+            written.append(path)
+        delta_index = deltas.finish() if deltas else None  # before removed areas' shards are deleted
+        if shards:
+            written.append(shards.finish())
+        if delta_index:
+            written.append(delta_index)
+        shutil.rmtree(self.dir, ignore_errors=True)
+        return written
+
+    def export(self, path: str, head: dict):
+        """shard mode: bundle the partials as-is into one file (head fields + "areas") instead of finalize()"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(json.dumps(head, ensure_ascii=False, separators=(",", ":"))[:-1] + ',"areas":{')
+            for n, key in enumerate(self.keys()):
+                with open(self._path(key), "r", encoding="utf-8") as p:
+                    f.write(("," if n else "") + json.dumps(key, ensure_ascii=False) + ":" + p.read())
+            f.write("}}")
+        os.replace(path + ".tmp", path)
+        shutil.rmtree(self.dir, ignore_errors=True)
+        return path
+
+# =========================
+# Horizontal shards (--shard i/N -> --merge)
+# =========================
+def parse_shard(spec: str):
+    """ "i/N" -> (i, N) with 0 <= i < N """
+    try:
+        i, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"--shard は i/N 形式: {spec!r}")
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f"--shard は 0 <= i < N: {spec!r}")
+    return i, n
+
+def shard_areas(areas: dict, index: int, count: int) -> dict:
+    """
+    Deterministic split over event-search regions (a region's JMA offices stay together).
+    Regions larger than the per-shard target ceil(len(areas)/count) are cut into chunks of that size
+    (one extra regional search per cut), then units, largest first, go to the least loaded shard,
+    so shard sizes differ by at most that target. Areas keep TARGET_AREAS order.
+    """
+    cap = -(-len(areas) // count)
+    units = {}
+    for members in event_region_groups(areas, max_areas=cap).values():
+        units.setdefault(next(iter(members)), members)
+    load = [0] * count
+    owner = {}
+    for members in sorted(units.values(), key=len, reverse=True):  # stable: ties in TARGET_AREAS order
+        i = load.index(min(load))
+        load[i] += len(members)
+        owner.update(dict.fromkeys(members, i))
+    return {k: v for k, v in areas.items() if owner[k] == index}
+
+def shard_result_path(index: int, count: int) -> str:
+    return os.path.join(SHARD_RESULTS_DIR, f"shard-{index}-of-{count}.json")
+
+def export_shard(writer, run_date: str, index: int, count: int) -> str:
+    """this shard's areas + their incremental state -> one file for the merge job"""
+    with _state_lock:
+        state = {k: _next_state[k] for k in writer.keys() if k in _next_state}
+    head = {"run_date": run_date, "shard": index, "of": count, "model": GEMINI_MODEL,
+            "generated_at": datetime.now(JST).isoformat(timespec="seconds"), "ai_state": state}
+    return writer.export(shard_result_path(index, count), head)
+
+def load_shard_results():
+    """shard result files of the newest run date -> (run_date, [result, ...])"""
+    results = []
+    if os.path.isdir(SHARD_RESULTS_DIR):
+        for name in sorted(os.listdir(SHARD_RESULTS_DIR)):
+            if name.startswith("shard-") and name.endswith(".json"):
+                data = _load_json(os.path.join(SHARD_RESULTS_DIR, name))
+                if isinstance(data, dict) and isinstance(data.get("areas"), dict):
+                    data["_path"] = os.path.join(SHARD_RESULTS_DIR, name)
+                    results.append(data)
+    if not results:
+        return None, []
+    run_date = max(r.get("run_date") or "" for r in results)
+    stale = [r for r in results if r.get("run_date") != run_date]
+    if stale:
+        print(f"⚠️ merge: 古いshard結果を無視 {[os.path.basename(r['_path']) for r in stale]}", flush=True)
+    return run_date, [r for r in results if r.get("run_date") == run_date]
+
+def merge_shards(writer, results, today: datetime) -> dict:
+    """
+    shard results -> writer partials (TARGET_AREAS order) + merged incremental state.
+    Areas no shard delivered are filled from the previous output (past days dropped) and keep their old state.
+    """
+    numbered = [r for r in results if isinstance(r.get("of"), int) and isinstance(r.get("shard"), int) and r["of"] >= 1]
+    unnumbered = [os.path.basename(r["_path"]) for r in results if r not in numbered]
+    if unnumbered:
+        print(f"⚠️ merge: shard番号なし（エリアのみ使用） {unnumbered}", flush=True)
+    counts = {r["of"] for r in numbered}
+    if len(counts) > 1:
+        print(f"⚠️ merge: shard数が不一致 {sorted(counts)}", flush=True)
+    expected = max(counts, default=0)
+    got = {r["shard"] for r in numbered if r["of"] == expected}
+    missing_shards = sorted(set(range(expected)) - got)
+    if missing_shards:
+        print(f"⚠️ merge: shard欠落 {missing_shards} / {expected}", flush=True)
+    elif not expected:
+        print("⚠️ merge: shard数不明（全shardの番号なし）", flush=True)
+
+    merged = {}
+    for r in results:
+        for key, data in r["areas"].items():
+            merged.setdefault(key, data)  # duplicates (re-run shard): first one wins
+        with _state_lock:
+            for key, days in (r.get("ai_state") or {}).items():
+                _next_state.setdefault(key, days)
+
+    missing = [k for k in TARGET_AREAS if k not in merged]
+    filled, lost = [], []
+    previous = load_existing_output() if missing else None
+    today_key = today.strftime("%Y-%m-%d")
+    for key in TARGET_AREAS:
+        data = merged.get(key)
+        if data is not None:
+            writer.add(key, data.get("forecasts") or [], data.get("long_term_text") or "", data.get("inputs"))
+        elif previous and key in previous:
+            forecasts, text = previous[key]
+            writer.add(key, [d for d in forecasts if (d.get("date_key") or today_key) >= today_key], text)
+            restore_ai_days(key, _prev_state.get(key))
+            filled.append(key)
+        else:
+            lost.append(key)
+
+    print(f"🧩 merge: shard {len(got)}/{expected}, エリア {len(TARGET_AREAS) - len(missing)}/{len(TARGET_AREAS)}", flush=True)
+    if filled:
+        print(f"⚠️ merge: 前回出力で補完 {filled}", flush=True)
+    if lost:
+        print(f"❌ merge: データなし（出力から欠落） {lost}", flush=True)
+    return {"shards": expected, "missing_shards": missing_shards, "filled": filled, "lost": lost}
+
+def run_merge(today: datetime):
+    run_date, results = load_shard_results()
+    if not results:
+        print(f"⚠️ shard結果なし: {SHARD_RESULTS_DIR}", flush=True)
+        return
+    load_ai_state()  # previous state: kept for areas filled from the previous output
+    try:
+        writer = OutputWriter(run_date, partial_name="partial-merge")
+        with METRICS.stage("write"):
+            merge_shards(writer, results, today)
+            archive_run(writer, "full", today)
+            written = writer.finalize()
+            save_ai_state()
+        for r in results:
+            os.remove(r["_path"])  # consumed; a re-run needs fresh shard results
+        for path in written:
+            print(f"\n✅ 保存完了: {path}", flush=True)
+    finally:
+        write_run_report()
+    print("✅ merge 完了", flush=True)
 
 # =========================
 # Main
 # =========================
-def main():
+def archive_run(writer, kind: str, started_at: datetime):
+    """append this run to the SQLite archive (before finalize() removes the partials); never fails the run"""
+    if not ARCHIVE:
+        return
+    try:
+        store = archive.Archive(ARCHIVE_PATH)
+        try:
+            meta = {"run_days": RUN_DAYS, "ai_days": AI_DAYS, "ai_batch_days": AI_BATCH_DAYS, "prompt_version": prompt_builder().version}
+            run_id = store.begin_run(started_at.isoformat(timespec="seconds"), started_at.strftime("%Y-%m-%d"),
+                                     kind=kind, model=GEMINI_MODEL, meta=meta)
+            rows = 0
+            for key in writer.keys():
+                forecasts, long_term_text = writer.load(key)
+                rows += store.add_area(run_id, key, compact_area(forecasts, long_term_text), writer.inputs(key))
+            store.finish_run(run_id, round((datetime.now(JST) - started_at).total_seconds(), 1))
+        finally:
+            store.close()
+        print(f"🗄️ archive: run {run_id} ({rows} rows) → {ARCHIVE_PATH}", flush=True)
+    except Exception as e:
+        print(f"archive Err: {e}", flush=True)
+
+def write_run_report():
+    extra = {
+        "settings": {"areas": len(TARGET_AREAS), "run_days": RUN_DAYS, "ai_days": AI_DAYS, "ai_batch_days": AI_BATCH_DAYS,
+                     "priority_near_days": PRIORITY_NEAR_DAYS, "model": GEMINI_MODEL},
+        "caches": {c.name: {"hit": c.hits, "miss": c.misses} for c in RUN_CACHES},
+        "gemini_cache": dict(GEMINI_CACHE_STATS),
+        "prompts": prompt_builder().report(),
+        "scheduler": {"deadline_sec": DEADLINE_SECONDS, "units": SCHEDULER.units if SCHEDULER else 0,
+                      "skipped_units": SCHEDULER.skipped_units if SCHEDULER else 0,
+                      "skipped_days": SCHEDULER.skipped_days if SCHEDULER else 0},
+        "resume": {"enabled": bool(CHECKPOINTS and CHECKPOINTS.resume), "checkpoint_hits": CHECKPOINTS.hits if CHECKPOINTS else 0},
+        "upstreams": {g.name: {"calls": g.calls, "failures": g.failures, "skipped": g.rejected, "trips": g.trips} for g in UPSTREAMS.values()},
+    }
+    try:
+        with open(RUN_REPORT_PATH, "w", encoding="utf-8") as f:
+            json.dump(METRICS.report(extra), f, ensure_ascii=False, indent=2)
+        print(f"📊 run report: {RUN_REPORT_PATH}", flush=True)
+    except Exception as e:
+        print(f"run report Err: {e}", flush=True)
+
+def run_weather_only(run_date: str):
+    started_at = datetime.now(JST)
+    existing = load_existing_output()
+    if existing is None:
+        print(f"⚠️ 既存データなし: {OUTPUT_PATH}（通常実行が先に必要）", flush=True)
+        return
+    try:
+        writer = OutputWriter(run_date, partial_name="partial-weather")
+        asyncio.run(refresh_all_weather(existing, writer))
+        with METRICS.stage("write"):
+            archive_run(writer, "weather", started_at)
+            written = writer.finalize()
+        for path in written:
+            print(f"\n✅ 保存完了: {path}", flush=True)
+        for g in UPSTREAMS.values():
+            print(f"📊 upstream {g.stats_line()}", flush=True)
+    finally:
+        write_run_report()
+    print("✅ 天気のみ更新 完了", flush=True)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Eagle Eye assets writer")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip areas / AI days / event facts already completed today (interrupted run)")
+    parser.add_argument("--weather-only", action="store_true",
+                        help="refresh weather numbers of the existing output only (no Gemini, AI text kept)")
+    parser.add_argument("--shard", metavar="i/N", default=None,
+                        help="process only shard i of N (0-based, split by event region, balanced); result goes to SHARD_RESULTS_DIR")
+    parser.add_argument("--merge", action="store_true",
+                        help="combine the shard results into the final output (missing areas filled from the previous output)")
+    args = parser.parse_args(argv)
+    if args.shard:
+        try:
+            args.shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    if sum(map(bool, (args.weather_only, args.shard, args.merge))) > 1:
+        parser.error("--weather-only / --shard / --merge は同時に指定できません")
+    return args
+
+def main(argv=None):
+    global CHECKPOINTS
+    args = parse_args(argv)
     today = datetime.now(JST)
     print(f"🦅 Eagle Eye (assets writer) 起動: {today.strftime('%Y/%m/%d %H:%M')}", flush=True)
 
     out_dir = os.path.dirname(OUTPUT_PATH)
     os.makedirs(out_dir, exist_ok=True)
 
-    master_data = {}
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(process_single_area, item) for item in TARGET_AREAS.items()]
-        for future in as_completed(futures):
-            try:
-                key, data = future.result()
-                master_data[key] = data
-            except Exception as e:
-                print(f"Err: {e}", flush=True)
+    METRICS.reset()
+    for c in RUN_CACHES:
+        c.clear()
+    AMEDAS_STATS.clear()
+    for k in GEMINI_CACHE_STATS:
+        GEMINI_CACHE_STATS[k] = 0
+    prompt_builder().reset()
+    for g in UPSTREAMS.values():
+        g.reset()
+
+    if OUTPUT_DELTAS and not OUTPUT_SHARDS:
+        print("⚠️ OUTPUT_DELTAS=1 には OUTPUT_SHARDS=1 が必要（差分の基準がエリア別シャード）: 差分は出力しません", flush=True)
+
+    run_date = today.strftime("%Y-%m-%d")
+    if args.weather_only:
+        run_weather_only(run_date)
+        return
+    if args.merge:
+        run_merge(today)
+        return
+
+    areas = TARGET_AREAS
+    if args.shard:
+        areas = shard_areas(TARGET_AREAS, *args.shard)
+        print(f"🧩 shard {args.shard[0]}/{args.shard[1]}: {len(areas)}/{len(TARGET_AREAS)} エリア", flush=True)
+
+    # per-shard namespace: a finished shard must not clear the partials/checkpoints of one still running
+    suffix = f"-shard-{args.shard[0]}-of-{args.shard[1]}" if args.shard else ""
+    load_ai_state()
+    CHECKPOINTS = CheckpointStore(run_date, resume=args.resume, name="checkpoint" + suffix)
+    if args.resume:
+        print(f"⏯️ resume: {CHECKPOINTS.dir}", flush=True)
 
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(master_data, f, ensure_ascii=False, indent=2)
+    try:
+        writer = OutputWriter(run_date, partial_name="partial" + suffix)
+        asyncio.run(run_all_areas(areas, writer))
 
-    print(f"\n✅ 保存完了: {OUTPUT_PATH}", flush=True)
+        with METRICS.stage("write"):
+            if args.shard:
+                # output, state and archive are written once, by --merge
+                written = [export_shard(writer, run_date, *args.shard)]
+            else:
+                archive_run(writer, "full", today)
+                written = writer.finalize()
+                save_ai_state()
+        CHECKPOINTS.clear()  # complete: nothing left to resume
+
+        for path in written:
+            print(f"\n✅ 保存完了: {path}", flush=True)
+        for c in RUN_CACHES:
+            print(f"📊 cache {c.stats_line()}", flush=True)
+        for g in UPSTREAMS.values():
+            print(f"📊 upstream {g.stats_line()}", flush=True)
+        if GEMINI_CACHE:
+            gemini_cache_prune()
+            st = GEMINI_CACHE_STATS
+            print(f"📊 cache Gemini: hit={st['hit']} miss={st['miss']} store={st['store']} evict={st['evict']} reject={st['reject']}", flush=True)
+        pr = prompt_builder().report()
+        if pr["prompts"]:
+            print(f"📊 prompt: {pr['prompts']}件 平均{pr['avg_chars']}字 (従来レイアウト比 -{pr['saved_pct']}%)", flush=True)
+    finally:
+        # also on failure: the report is how we find out where the time went
+        write_run_report()
     print("✅ 全工程完了", flush=True)
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+# serve.py
+# Eagle Eye - local serving layer for the generated forecast data
+# - GET /areas, /areas/{key}, /areas/{key}/{YYYY-MM-DD}
+# - parsed once into an in-memory snapshot; every body precompressed (gzip, brotli if installed)
+# - strong ETag per representation -> If-None-Match polls get 304 without a body
+# - the data file is watched; a new file is loaded into a new snapshot and swapped in atomically
+#
+# usage:
+#   python serve.py
+#   python serve.py --port 8080 --data assets/eagle_eye_data.json
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import main as ee
+
+try:
+    import brotli  # optional
+except ImportError:
+    brotli = None
+
+RELOAD_CHECK_SEC = float(os.environ.get("SERVE_RELOAD_CHECK_SEC", "2"))
+
+# =========================
+# Snapshot (immutable once built)
+# =========================
+class Body:
+    """one JSON resource in every encoding, with a strong ETag per representation"""
+    __slots__ = ("encodings", "etags")
+
+    def __init__(self, obj):
+        raw = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        tag = hashlib.sha256(raw).hexdigest()[:32]
+        self.encodings = {"identity": raw, "gzip": gzip.compress(raw, compresslevel=9, mtime=0)}
+        self.etags = {"identity": f'"{tag}"', "gzip": f'"{tag}-gz"'}
+        if brotli is not None:
+            self.encodings["br"] = brotli.compress(raw)
+            self.etags["br"] = f'"{tag}-br"'
+
+class Snapshot:
+    def __init__(self, path: str):
+        st = os.stat(path)
+        with open(path, "r", encoding="utf-8") as f:
+            doc = ee.expand_document(json.load(f))  # full or compact (v2)
+        self.stamp = (st.st_mtime_ns, st.st_size)
+        self.last_modified = formatdate(st.st_mtime, usegmt=True)
+        self.routes = {}
+
+        index = []
+        for key, days in doc.items():
+            by_date = {d["date_key"]: d for d in days if isinstance(d, dict) and d.get("date_key")}
+            index.append({
+                "key": key,
+                "name": (ee.TARGET_AREAS.get(key) or {}).get("name", key),
+                "days": len(days),
+                "first_date": min(by_date) if by_date else None,
+                "last_date": max(by_date) if by_date else None,
+            })
+            self.routes[f"/areas/{key}"] = Body(days)
+            for dk, day in by_date.items():
+                self.routes[f"/areas/{key}/{dk}"] = Body(day)
+        self.routes["/areas"] = Body({"job_keys": ee.JOB_KEYS, "areas": index})
+
+class SnapshotStore:
+    """current snapshot + reload when the generator replaced the file (os.replace -> new mtime/size)"""
+    def __init__(self, path: str):
+        self.path = path
+        self.snapshot = Snapshot(path)
+        self._lock = threading.Lock()
+        self._checked = time.monotonic()
+
+    def current(self) -> Snapshot:
+        now = time.monotonic()
+        if now - self._checked >= RELOAD_CHECK_SEC and self._lock.acquire(blocking=False):
+            try:
+                self._checked = now
+                st = os.stat(self.path)
+                if (st.st_mtime_ns, st.st_size) != self.snapshot.stamp:
+                    self.snapshot = Snapshot(self.path)  # built aside, then one reference swap
+                    print(f"🔄 reload: {self.path} ({len(self.snapshot.routes)} routes)", flush=True)
+            except Exception as e:
+                print(f"reload Err: {e}", flush=True)  # keep serving the previous snapshot
+            finally:
+                self._lock.release()
+        return self.snapshot
+
+# =========================
+# HTTP
+# =========================
+def choose_encoding(accept_encoding: str, available) -> str:
+    offered = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            offered[name.strip().lower()] = q
+    for enc in ("br", "gzip"):
+        if enc in available and offered.get(enc, 0) > 0:
+            return enc
+    return "identity"
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [t.strip() for t in (if_none_match or "").split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+class Handler(BaseHTTPRequestHandler):
+    store: SnapshotStore = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _serve(self, head: bool):
+        snap = self.store.current()
+        body = snap.routes.get(urlparse(self.path).path.rstrip("/") or "/")
+        if body is None:
+            body = Body({"error": "not found"})
+            status = 404
+        else:
+            status = 200
+
+        enc = choose_encoding(self.headers.get("Accept-Encoding"), body.encodings)
+        etag = body.etags[enc]
+        if status == 200 and etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            return
+
+        raw = body.encodings[enc]
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(raw)))
+        if enc != "identity":
+            self.send_header("Content-Encoding", enc)
+        if status == 200:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", snap.last_modified)
+            self.send_header("Cache-Control", "no-cache")  # always revalidate -> cheap 304
+        self.send_header("Vary", "Accept-Encoding")
+        self.end_headers()
+        if not head:
+            self.wfile.write(raw)
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+def make_server(path: str, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    handler = type("EagleEyeHandler", (Handler,), {"store": SnapshotStore(path)})
+    srv = ThreadingHTTPServer((host, port), handler)
+    srv.daemon_threads = True
+    return srv
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Eagle Eye forecast server")
+    ap.add_argument("--data", default=ee.OUTPUT_PATH, help="generator output (full or compact)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    args = ap.parse_args(argv)
+
+    srv = make_server(args.data, args.host, args.port)
+    snap = srv.RequestHandlerClass.store.snapshot
+    print(f"🦅 serving {args.data} ({len(snap.routes)} routes, br={'on' if brotli else 'off'}) "
+          f"on http://{args.host}:{srv.server_address[1]}", flush=True)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+
+if __name__ == "__main__":
+    main()
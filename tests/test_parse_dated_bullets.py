@@ -0,0 +1,84 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import parse_dated_bullets  # noqa: E402
+
+DAYS = ["2026-10-18", "2026-10-19", "2026-10-20"]
+
+
+def test_delimiter_format_with_tags():
+    text = (
+        "@@ 2026-10-18\n"
+        "- [tokyo_shibuya] 渋谷で音楽フェス\n"
+        "- 山手線 一部運休\n"
+        "@@ 2026-10-19\n"
+        "- 特段の検索結果なし\n"
+    )
+    out = parse_dated_bullets(text, DAYS, tags=["tokyo_shibuya"])
+    assert out["tokyo_shibuya"]["2026-10-18"] == "- 渋谷で音楽フェス"
+    assert out["common"]["2026-10-18"] == "- 山手線 一部運休"
+    assert out["common"]["2026-10-19"] == "- 特段の検索結果なし"
+    assert out["common"]["2026-10-20"] == ""
+
+
+def test_bullets_starting_with_a_date_stay_under_their_heading():
+    text = (
+        "@@ 2026-10-18\n"
+        "* 2026-10-20 東京ドーム公演の告知\n"
+        "- 2026/10/19 からの工事情報\n"
+        "- 銀座線 遅延\n"
+    )
+    out = parse_dated_bullets(text, DAYS)
+    assert out["common"]["2026-10-18"].splitlines() == [
+        "- 2026-10-20 東京ドーム公演の告知",
+        "- 2026/10/19 からの工事情報",
+        "- 銀座線 遅延",
+    ]
+    assert out["common"]["2026-10-20"] == ""
+
+
+def test_prose_date_is_not_a_heading():
+    text = (
+        "## 2026年10月18日\n"
+        "2026年10月20日に国際会議が開催予定\n"
+        "- 臨時列車あり\n"
+    )
+    out = parse_dated_bullets(text, DAYS)
+    assert out["common"]["2026-10-18"].splitlines() == ["- 2026年10月20日に国際会議が開催予定", "- 臨時列車あり"]
+    assert out["common"]["2026-10-20"] == ""
+
+
+def test_marked_and_bold_headings_with_weekday():
+    text = (
+        "■ 2026年10月18日（日）\n"
+        "- **渋谷** ハロウィン前の混雑\n"
+        "**2026-10-19 (月)**\n"
+        "- 首都高 工事規制\n"
+        "【2026/10/20（火）】 台風接近で欠航の可能性\n"
+    )
+    out = parse_dated_bullets(text, DAYS)
+    assert out["common"]["2026-10-18"] == "- 渋谷 ハロウィン前の混雑"
+    assert out["common"]["2026-10-19"] == "- 首都高 工事規制"
+    assert out["common"]["2026-10-20"] == "- 台風接近で欠航の可能性"
+
+
+def test_unknown_heading_and_out_of_range_dates_are_dropped():
+    text = (
+        "@@ 2026-10-18\n"
+        "- 花火大会\n"
+        "@@ 不明\n"
+        "- 日程未定のイベント\n"
+        "@@ 2026-11-01\n"
+        "- 範囲外\n"
+    )
+    out = parse_dated_bullets(text, DAYS)
+    assert out["common"]["2026-10-18"] == "- 花火大会"
+    assert "範囲外" not in "".join(out["common"].values())
+    assert "日程未定" not in "".join(out["common"].values())
+
+
+def test_no_heading_returns_none():
+    assert parse_dated_bullets("- 2026-10-18 渋谷で音楽フェス\n2026年10月19日は晴れ", DAYS) is None
+    assert parse_dated_bullets("", DAYS) is None
@@ -0,0 +1,46 @@
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import EVENT_REGION_OF_JMA, TARGET_AREAS, event_region_groups, shard_areas  # noqa: E402
+
+
+def _split(count):
+    return [shard_areas(TARGET_AREAS, i, count) for i in range(count)]
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 4, 5, 8, 12, len(TARGET_AREAS), len(TARGET_AREAS) + 3])
+def test_every_area_in_exactly_one_shard(count):
+    keys = [k for part in _split(count) for k in part]
+    assert sorted(keys) == sorted(TARGET_AREAS)
+
+
+@pytest.mark.parametrize("count", [2, 3, 4, 5, 8, 12])
+def test_shard_sizes_differ_by_at_most_the_cap(count):
+    cap = math.ceil(len(TARGET_AREAS) / count)
+    sizes = [len(part) for part in _split(count)]
+    assert max(sizes) - min(sizes) <= cap
+
+
+def test_areas_keep_target_order_and_split_is_deterministic():
+    order = list(TARGET_AREAS)
+    for part in _split(4):
+        keys = list(part)
+        assert keys == sorted(keys, key=order.index)
+    assert _split(4) == _split(4)
+
+
+def test_regions_that_fit_stay_on_one_shard():
+    count = 2  # cap 16: every region except Kanto (17) fits
+    cap = math.ceil(len(TARGET_AREAS) / count)
+    owner = {k: i for i, part in enumerate(_split(count)) for k in part}
+    for members in event_region_groups(TARGET_AREAS).values():
+        if len(members) <= cap:
+            assert len({owner[k] for k in members}) == 1
+    regions = {EVENT_REGION_OF_JMA.get(a["jma_code"], a["jma_code"]) for a in TARGET_AREAS.values()}
+    searches = sum(len({id(m) for m in event_region_groups(part).values()}) for part in _split(count))
+    assert searches <= len(regions) + 1  # one extra regional search for the cut region